@@ -0,0 +1,184 @@
+"""run_benchmarks.py
+
+Time each stage of a render on synthetic maps of several sizes, and record the results
+as json so they can be compared between two versions.
+
+Run it from the root of the repository:
+    python -m benchmarks.run_benchmarks --sizes 1000 10000 --output bench.json
+    python -m benchmarks.run_benchmarks --sizes 1000 10000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synthetic_world import (MAX_FILE_TILES, generate_world, world_tiles,
+                                        write_world)
+from classes.grid_renderer import Renderer
+from classes.hexagon_renderer import draw_rings
+from classes.tile_loader import find_files
+from classes.tilemetadata import TileMetadata
+from classes.zone_outline import group_by_zone, zone_outlines
+from hexamap import RADIUS, add_border_tiles
+
+DEFAULT_SIZES = (1000, 10000)
+
+
+class StageTimer:
+    """Measure the duration of successive stages
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Optional[float]] = {}
+
+    def run(self, stage: str, function: Callable[[], Any]) -> Any:
+        """Run a stage and store its duration
+
+        Args:
+            stage (str): name of the stage
+            function (Callable[[], Any]): the stage
+
+        Returns:
+            Any: the result of the stage
+        """
+        start = time.perf_counter()
+        result = function()
+        self.stages[stage] = round(time.perf_counter() - start, 4)
+        return result
+
+
+def run_size(size: int, seed: int) -> Dict[str, Any]:
+    """Run all stages on a synthetic map. Stages which read files are skipped for maps too
+    big to be described by files. This function is run in its own process, so the peak
+    memory is the one of this size only.
+
+    Args:
+        size (int): number of tiles
+        seed (int): seed of the generator
+
+    Returns:
+        Dict[str, Any]: the duration of each stage, in seconds
+    """
+    # pylint: disable=too-many-locals
+    timer = StageTimer()
+    world = timer.run('generate', lambda: generate_world(size, seed))
+    with tempfile.TemporaryDirectory() as directory:
+        files: List[str] = []
+        if size <= MAX_FILE_TILES:
+            files = timer.run('write_files', lambda: write_world(world, directory))
+            files = timer.run('glob', lambda: find_files([os.path.join(directory, '*')]))
+            tiles = timer.run('parse', lambda: [tile for file in files
+                                                for tile in TileMetadata.from_file(file)])
+        else:
+            timer.stages.update({'write_files': None, 'glob': None, 'parse': None})
+            tiles = world_tiles(world)
+
+        tiles = timer.run('add_border_tiles', lambda: list(add_border_tiles(tiles)))
+        renderer = timer.run('renderer_init', lambda: Renderer(tiles, '', RADIUS))
+
+        # Each layer is drawn like the Renderer does, without filling its caches
+        hex_renderer = renderer.hex_renderer
+        for layer in ('load_icon', 'draw_content', 'draw_grid', 'draw_numbers'):
+            draw_tile = getattr(hex_renderer, layer)
+            timer.run(layer, lambda draw_tile=draw_tile: [draw_tile(tile) for tile in tiles])
+        timer.run('draw_zones', lambda: [
+            draw_rings(polygon, f"zone {zone}")
+            for zone, members in group_by_zone(((tile.col, tile.row), tile.zones)
+                                               for tile in tiles).items()
+            for polygon in zone_outlines(members, lambda coord: hex_renderer.compute_shape(
+                renderer.tiles[coord]).hexagon_points)])
+
+        output_file = os.path.join(directory, 'map.svg')
+        for stage in ('render_svg', 'write_svg'):
+            # The first write draws every layer, the second one only writes cached fragments
+            with open(output_file, 'w', encoding="utf-8") as ofile:
+                timer.run(stage, lambda ofile=ofile: renderer.write_svg(ofile))
+        svg_bytes = os.path.getsize(output_file)
+
+    return {'tiles': size,
+            'rendered_tiles': len(tiles),
+            'files': len(files),
+            'svg_bytes': svg_bytes,
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'stages': timer.stages}
+
+
+def environment() -> Dict[str, Any]:
+    """
+    Returns:
+        Dict[str, Any]: description of the benchmarked version and machine
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True,
+                                capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()}
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]):
+    """Print the ratio between the duration of each stage and the baseline
+
+    Args:
+        results (List[Dict[str, Any]]): results of this run
+        baseline (Dict[str, Any]): the content of a previous result file
+    """
+    previous = {result['tiles']: result['stages'] for result in baseline['results']}
+    for result in results:
+        if result['tiles'] not in previous:
+            continue
+        print(f"{result['tiles']} tiles, compared to {baseline['environment']['commit']}:")
+        for stage, duration in result['stages'].items():
+            before = previous[result['tiles']].get(stage)
+            if duration is None or not before:
+                continue
+            print(f"  {stage:18} {before:9.3f}s -> {duration:9.3f}s  x{duration / before:.2f}")
+
+
+def main():
+    """Run the benchmarks from the command line
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', 1)[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Number of tiles of the benchmarked maps. Maps bigger than " +
+                             f"{MAX_FILE_TILES} tiles are generated in memory, without files")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated maps")
+    parser.add_argument("--output", type=str, default=None, help="Json file of the results")
+    parser.add_argument("--compare", type=str, default=None,
+                        help="Json file of previous results, to compare with")
+    options = parser.parse_args()
+
+    results = []
+    for size in options.sizes:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_size, size, options.seed).result()
+        results.append(result)
+        print(json.dumps(result), file=sys.stderr)
+
+    report = {'environment': environment(), 'seed': options.seed, 'results': results}
+    if options.output:
+        with open(options.output, 'w', encoding="utf-8") as ofile:
+            json.dump(report, ofile, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if options.compare:
+        with open(options.compare, 'r', encoding="utf-8") as cfile:
+            compare(results, json.load(cfile))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""slow_reads.py
+
+Time the parsing of a synthetic map whose files are slow to read, like on a network mount:
+each read waits for a fixed latency before reading the local file. Files are read one by one,
+then with several reads in flight, and last with the most reads in flight and a parse cache:
+empty, filled, then filled with every file touched.
+
+Run it from the root of the repository:
+    python -m benchmarks.slow_reads --size 2000 --latency 5 --concurrency 1 4 16 64
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+from benchmarks.synthetic_world import generate_world, write_world
+from classes.parse_cache import CACHE_FILENAME, ParseCache
+from classes.tile_loader import parse_files, read_and_parse, read_tile_file
+from classes.tilemetadata import TileMetadata
+
+
+def delayed_read(latency: float):
+    """
+    Args:
+        latency (float): delay before each read, in seconds
+
+    Returns:
+        Callable[[str], bytes]: reads a file like read_tile_file, after the delay
+    """
+    def read(filename: str) -> bytes:
+        time.sleep(latency)
+        return read_tile_file(filename)
+    return read
+
+
+def contents(parsed: Iterable[List[TileMetadata]]) -> List[List[Tuple[int, int, Any]]]:
+    """
+    Returns:
+        List[List[Tuple[int, int, Any]]]: coordinates and content of the tiles of each file
+    """
+    return [[(tile.col, tile.row, tile.content) for tile in tiles] for tiles in parsed]
+
+
+def run(files: List[str], latency: float, concurrencies: List[int]) -> Dict[str, Any]:
+    """
+    Args:
+        files (List[str]): files of the map
+        latency (float): delay before each read, in seconds
+        concurrencies (List[int]): numbers of reads in flight to time
+
+    Returns:
+        Dict[str, Any]: the duration of the parse of the files, without delay, for each
+        number of reads in flight, and for each state of the cache, in seconds
+    """
+    start = time.perf_counter()
+    expected = parse_files(files)
+    results = {'no_latency': round(time.perf_counter() - start, 4)}
+    for concurrency in concurrencies:
+        start = time.perf_counter()
+        parsed = read_and_parse(files, concurrency, read=delayed_read(latency))
+        results[f'concurrency_{concurrency}'] = round(time.perf_counter() - start, 4)
+        if contents(tiles for tiles, _ in parsed) != contents(expected):
+            raise AssertionError(f'Different tiles with {concurrency} reads in flight')
+
+    concurrency = max(concurrencies)
+    with tempfile.TemporaryDirectory() as directory:
+        with ParseCache(Path(directory) / CACHE_FILENAME) as cache:
+            for state in ('cold', 'warm', 'touched'):
+                if state == 'touched':
+                    for file in files:
+                        os.utime(file)
+                start = time.perf_counter()
+                parsed = parse_files(files, cache=cache, io_concurrency=concurrency,
+                                     read=delayed_read(latency))
+                results[f'cache_{state}_concurrency_{concurrency}'] = \
+                    round(time.perf_counter() - start, 4)
+                if contents(parsed) != contents(expected):
+                    raise AssertionError(f'Different tiles with a {state} cache')
+    return results
+
+
+def main():
+    """Run the benchmark from the command line
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', 1)[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2000, help="Number of tiles of the map")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated map")
+    parser.add_argument("--latency", type=float, default=5,
+                        help="Delay before each read, in milliseconds (default: 5)")
+    parser.add_argument("--concurrency", type=int, nargs='+', default=[1, 4, 16, 64],
+                        help="Numbers of reads in flight to time")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_world(generate_world(options.size, options.seed), directory)
+        results = run(sorted(files), options.latency / 1000, options.concurrency)
+    print(json.dumps({'tiles': options.size, 'files': len(files),
+                      'latency_ms': options.latency, 'cpu_count': os.cpu_count(),
+                      'seconds': results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""synthetic_world.py
+
+Generate a random but plausible map, the same one for a given size and seed: regions of
+terrain, mixed sides between regions, roads and rivers following paths of neighbor tiles,
+zones, icons and texts.
+"""
+import math
+import os
+import random
+from typing import Any, Dict, List
+
+import yaml
+
+from classes.hexcoord import Coord, neighbor
+from classes.tilemetadata import TileMetadata
+
+# Terrains which have an icon
+TERRAINS = ('grassland', 'grassland', 'grassland', 'light_wood', 'heavy_woods', 'hills',
+            'mountains', 'marsh', 'sea', 'sea', 'lake', 'desert')
+BUILDINGS = ('capitale', 'cavaliers', 'fort', 'fortin', 'mages', 'nains', 'observatoire',
+             'pont', 'portail', 'ruines', 'temple', 'village')
+ZONES = ('secured', 'dangerous', 'unknown')
+# Side of a tile crossed by each edge (see hexcoord.NEIGHBOR_OFFSETS)
+EDGE_SIDES = ('NE', 'N', 'NW', 'SW', 'S', 'SE')
+# Size of terrain regions, in tiles
+REGION_SIZE = 6
+
+# Coordinates are written with two digits in file names and yaml keys
+MAX_COORD = 99
+MAX_FILE_TILES = (2 * MAX_COORD + 1) ** 2
+
+
+def map_coords(count: int) -> List[Coord]:
+    """
+    Args:
+        count (int): number of tiles
+
+    Returns:
+        List[Coord]: (col, row) of the tiles of a square map centered on (0, 0)
+    """
+    cols = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / cols)
+    return [(col - cols // 2, row - rows // 2)
+            for col in range(cols) for row in range(rows)][:count]
+
+
+def random_walk(rng: random.Random, tiles: Dict[Coord, Dict[str, Any]], key: str,
+                length: int):
+    """Add a road or a river along a walk between neighbor tiles. The walk mostly keeps
+    its direction, and stops at the border of the map.
+
+    Args:
+        rng (random.Random): the random generator
+        tiles (Dict[Coord, Dict[str, Any]]): content of the tiles, by coordinates
+        key (str): 'roads' or 'rivers'
+        length (int): maximum number of tiles of the walk
+    """
+    coord = rng.choice(list(tiles))
+    edge = rng.randrange(6)
+    entry = 'C'
+    for _ in range(length):
+        if rng.random() < 0.3:
+            edge = (edge + rng.choice((-1, 1))) % 6
+        next_coord = neighbor(coord, edge)
+        exit_side = EDGE_SIDES[edge] if next_coord in tiles else 'C'
+        if entry != exit_side:
+            tiles[coord].setdefault(key, []).append(f"{entry} {exit_side}")
+        if next_coord not in tiles:
+            break
+        coord = next_coord
+        entry = EDGE_SIDES[(edge + 3) % 6]
+
+
+def generate_world(count: int, seed: int = 0) -> Dict[Coord, Dict[str, Any]]:
+    """Generate the content of the tiles of a map
+
+    Args:
+        count (int): number of tiles
+        seed (int, optional): seed of the random generator
+
+    Returns:
+        Dict[Coord, Dict[str, Any]]: content of each tile, as it would be read from a file
+    """
+    # pylint: disable=too-many-locals
+    rng = random.Random(seed)
+    coords = map_coords(count)
+    regions: Dict[Coord, str] = {}
+    zones: Dict[Coord, str] = {}
+
+    def region(coord: Coord, size: int, table: Dict[Coord, str], values) -> str:
+        # Jitter the coordinates so regions are not squares
+        key = ((coord[0] + rng.randrange(3)) // size, (coord[1] + rng.randrange(3)) // size)
+        if key not in table:
+            table[key] = rng.choice(values)
+        return table[key]
+
+    terrains = {coord: region(coord, REGION_SIZE, regions, TERRAINS) for coord in coords}
+    tiles: Dict[Coord, Dict[str, Any]] = {}
+    for coord in coords:
+        content: Dict[str, Any] = {'terrain': {'type': terrains[coord]}}
+        # Mixed sides towards neighbors of another terrain
+        mixed: Dict[str, List[str]] = {}
+        for edge, side in enumerate(EDGE_SIDES):
+            other = terrains.get(neighbor(coord, edge))
+            if other and other != terrains[coord] and rng.random() < 0.5:
+                mixed.setdefault(other, []).append(side)
+        if mixed:
+            content['terrain']['mixed'] = [{'type': terrain, 'sides': sides}
+                                           for terrain, sides in mixed.items()]
+        if rng.random() < 0.05:
+            content['icon'] = rng.choice(BUILDINGS)
+            content['alt'] = f"Place {len(tiles)}"
+        zone = region(coord, REGION_SIZE * 4, zones, ZONES + (None,) * 3)
+        if zone:
+            content['zone'] = zone
+        tiles[coord] = content
+
+    for _ in range(max(1, count // 200)):
+        random_walk(rng, tiles, 'roads', 30)
+    for _ in range(max(1, count // 500)):
+        random_walk(rng, tiles, 'rivers', 50)
+    return tiles
+
+
+def world_tiles(world: Dict[Coord, Dict[str, Any]]) -> List[TileMetadata]:
+    """
+    Returns:
+        List[TileMetadata]: the tiles of a generated world, without writing files
+    """
+    return [TileMetadata(col, row, content) for (col, row), content in world.items()]
+
+
+def coord_key(col: int, row: int) -> str:
+    """
+    Returns:
+        str: the coordinates as written in file names and yaml keys (XXYY, row first)
+    """
+    return ''.join(f"{'-' if value < 0 else ''}{abs(value):02d}" for value in (row, col))
+
+
+def write_world(world: Dict[Coord, Dict[str, Any]], directory: str,
+                yaml_share: float = 0.1, yaml_tiles: int = 100) -> List[str]:
+    """Write a generated world as markdown files with a frontmatter, one by tile, and yaml
+    files describing several tiles.
+
+    Args:
+        world (Dict[Coord, Dict[str, Any]]): content of the tiles
+        directory (str): an existing directory
+        yaml_share (float, optional): part of the tiles written in yaml files
+        yaml_tiles (int, optional): number of tiles by yaml file
+
+    Raises:
+        ValueError: if coordinates can't be written in file names
+
+    Returns:
+        List[str]: the written files
+    """
+    if any(max(abs(col), abs(row)) > MAX_COORD for col, row in world):
+        raise ValueError(f'Coordinates must be between -{MAX_COORD} and {MAX_COORD}')
+    coords = list(world)
+    yaml_count = int(len(coords) * yaml_share)
+    files = []
+    for coord in coords[yaml_count:]:
+        content = world[coord]
+        filename = os.path.join(
+            directory, f"{coord_key(*coord)}-{content['terrain']['type']}.md")
+        with open(filename, 'w', encoding="utf-8") as hex_file:
+            hex_file.write(f"---\n{yaml.safe_dump(content)}---\n\nSome notes about this place.\n")
+        files.append(filename)
+    for start in range(0, yaml_count, yaml_tiles):
+        part = coords[start:start + yaml_tiles]
+        filename = os.path.join(directory, f"tiles-{start // yaml_tiles}.yaml")
+        with open(filename, 'w', encoding="utf-8") as hex_file:
+            yaml.safe_dump({coord_key(*coord): world[coord] for coord in part}, hex_file)
+        files.append(filename)
+    return files
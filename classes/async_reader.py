@@ -0,0 +1,63 @@
+"""async_reader.py
+
+Read many files with several reads in flight, for files on network mounts where a read
+mostly waits for the server. Reads run in a bounded pool of threads driven by asyncio, and
+the content of each file is handed to the caller as soon as it arrives, so parsing overlaps
+the reads still in flight.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Sequence
+
+# Called with the index of a file, and either its content or the error raised while reading it
+Consumer = Callable[[int, Optional[bytes], Optional[Exception]], None]
+
+
+def read_bytes(filename: str) -> bytes:
+    """
+    Args:
+        filename (str): a file
+
+    Returns:
+        bytes: the content of the file
+    """
+    with open(filename, 'rb') as rfile:
+        return rfile.read()
+
+
+def read_files(files: Sequence[str], consume: Consumer, concurrency: int,
+               read: Callable[[str], bytes] = read_bytes) -> None:
+    """Read files with at most `concurrency` reads in flight. consume is called in the
+    calling thread, once by file, in the order the reads end. While it runs, the other reads
+    go on.
+
+    Args:
+        files (Sequence[str]): files to read
+        consume (Consumer): called with the index of each file, and its content or the error
+            raised by read
+        concurrency (int): maximum number of files read at once
+        read (Callable[[str], bytes], optional): reads a file, called in the threads
+    """
+    concurrency = max(1, concurrency)
+    # Each reader takes the next file when it is done with the previous one, so there is
+    # never more than one content by reader waiting to be consumed
+    pending = iter(range(len(files)))
+
+    async def reader(executor: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        for index in pending:
+            # pylint: disable=broad-except
+            try:
+                data = await loop.run_in_executor(executor, read, files[index])
+            except Exception as e:
+                consume(index, None, e)
+                continue
+            consume(index, data, None)
+
+    async def read_all():
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            await asyncio.gather(*(reader(executor)
+                                   for _ in range(min(concurrency, len(files)))))
+
+    if files:
+        asyncio.run(read_all())
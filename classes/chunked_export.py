@@ -0,0 +1,139 @@
+"""chunked_export.py
+
+Split a big map in chunks of a fixed number of columns and rows, each one rendered in its own
+svg file, with a json manifest so a viewer can load only visible chunks
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+from classes.grid_renderer import Renderer, process_pool
+from classes.svg_file import open_svg
+from classes.tilemetadata import TileMetadata
+from classes.viewport import TileIndex, Viewport, viewport_zones
+from classes.zone_outline import Ring
+
+
+def parse_tile_size(value: str) -> Tuple[int, int]:
+    """Parse the size of a chunk
+
+    Args:
+        value (str): "<cols>" or "<cols>x<rows>"
+
+    Raises:
+        ValueError: if the value isn't a valid size
+
+    Returns:
+        Tuple[int, int]: number of columns and rows of a chunk
+    """
+    cols, _, rows = value.lower().partition('x')
+    size = (int(cols), int(rows or cols))
+    if min(size) <= 0:
+        raise ValueError(f'{value} is not a valid tile size')
+    return size
+
+
+def split_tiles(tiles: Iterable[TileMetadata],
+                size: Tuple[int, int]) -> Dict[Tuple[int, int], List[TileMetadata]]:
+    """
+    Args:
+        tiles (Iterable[TileMetadata]): all tiles of the map
+        size (Tuple[int, int]): number of columns and rows of a chunk
+
+    Returns:
+        Dict[Tuple[int, int], List[TileMetadata]]: Tiles of each chunk, by chunk (col, row)
+    """
+    chunks: Dict[Tuple[int, int], List[TileMetadata]] = {}
+    for tile in tiles:
+        chunks.setdefault((tile.col // size[0], tile.row // size[1]), []).append(tile)
+    return chunks
+
+
+def chunk_viewport(key: Tuple[int, int], size: Tuple[int, int]) -> Viewport:
+    """
+    Args:
+        key (Tuple[int, int]): (col, row) of a chunk
+        size (Tuple[int, int]): number of columns and rows of a chunk
+
+    Returns:
+        Viewport: the columns and rows of the chunk
+    """
+    return Viewport(key[0] * size[0], (key[0] + 1) * size[0] - 1,
+                    key[1] * size[1], (key[1] + 1) * size[1] - 1)
+
+
+def render_chunk(task: Tuple[str, List[TileMetadata], str, float,
+                             Dict[str, List[List[Ring]]], Dict[str, Any]]) -> List[int]:
+    """Render a chunk in its file. This function is used as a worker in the process pool,
+    so it must stay at module level.
+
+    Args:
+        task: file to write, tiles, css, radius, zone outlines of the chunk and other
+            arguments of the Renderer
+
+    Returns:
+        List[int]: the view box of the chunk
+    """
+    output_file, tiles, css, radius, zones, options = task
+    renderer = Renderer(tiles, css, radius, zones, **options)
+    with open_svg(output_file) as ofile:
+        renderer.write_svg(ofile)
+    return list(renderer.view_box)
+
+
+def export_chunks(tiles: Iterable[TileMetadata], output_dir: Path, prefix: str, css: str,
+                  radius: float, *, size: Tuple[int, int], jobs: int = 1,
+                  suffix: str = '.svg', **options) -> Path:
+    """Render the map as many svg files, and write a manifest describing them.
+
+    Each chunk gets the zones of its tiles, cut one tile out of it like a viewport, so its
+    view box clips them and its size only depends on its own tiles.
+
+    Args:
+        tiles (Iterable[TileMetadata]): tiles of the map, border tiles included
+        output_dir (Path): directory of the chunks and the manifest
+        prefix (str): prefix of the generated files
+        css (str): custom css
+        radius (float): radius of an hexagon
+        size (Tuple[int, int]): number of columns and rows of a chunk
+        jobs (int, optional): Number of worker processes
+        suffix (str, optional): extension of the chunks, '.svg' or '.svgz'
+        options: other arguments of the Renderer (symbols, compact)
+
+    Returns:
+        Path: the manifest file
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    tiles = list(tiles)
+    output_dir = Path(output_dir)
+
+    index = TileIndex(tiles)
+    chunks = split_tiles(tiles, size)
+    keys = sorted(chunks)
+    tasks = []
+    for key in keys:
+        zones = viewport_zones(index, chunk_viewport(key, size), radius)
+        filename = output_dir.joinpath(f'{prefix}-{key[0]}_{key[1]}{suffix}')
+        tasks.append((str(filename), chunks[key], css, radius, zones, options))
+
+    if jobs > 1 and len(tasks) > 1:
+        with process_pool(jobs) as executor:
+            view_boxes = list(executor.map(render_chunk, tasks))
+    else:
+        view_boxes = [render_chunk(task) for task in tasks]
+
+    manifest = {
+        'radius': radius,
+        'tile_size': {'cols': size[0], 'rows': size[1]},
+        'chunks': [{
+            'file': Path(task[0]).name,
+            'chunk': {'col': key[0], 'row': key[1]},
+            'cols': [min(tile.col for tile in task[1]), max(tile.col for tile in task[1])],
+            'rows': [min(tile.row for tile in task[1]), max(tile.row for tile in task[1])],
+            'view_box': view_box,
+        } for key, task, view_box in zip(keys, tasks, view_boxes)],
+    }
+    manifest_file = output_dir.joinpath(f'{prefix}.json')
+    with open(manifest_file, 'w', encoding="utf-8") as mfile:
+        json.dump(manifest, mfile, indent=2)
+    return manifest_file
@@ -0,0 +1,153 @@
+"""fragment_cache.py
+
+Persistent cache of the svg drawn for each tile, so a render of a mostly unchanged map only
+draws the tiles which changed since the previous runs
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+from classes.templates import read_template
+
+FRAGMENT_CACHE_FILENAME = '.hexamap-fragments.sqlite'
+
+DEFAULT_MAX_BYTES = 100 * 2 ** 20
+
+# Templates used to draw the fragments: editing one of them invalidates the cache
+FRAGMENT_TEMPLATES = ('number', 'text', 'path', 'use', 'icon', 'scaled_icon')
+
+# Separates the fragments of the layers of a tile in the database. It can't be in svg.
+LAYER_SEPARATOR = '\0'
+
+# Number of keys by sqlite query, under the limit of variables of old sqlite versions
+QUERY_SIZE = 500
+
+
+class FragmentCache:
+    """Store the svg fragments of the layers of tiles in a sqlite database, by a hash of
+    everything they are drawn from.
+
+    Each entry records the last run which used it. When the fragments take more than the
+    maximum size, the entries unused for the most runs are removed when the cache is closed.
+    The whole cache is dropped when VERSION changes.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    # Increase it when the drawing of tiles changes, to invalidate existing caches
+    VERSION = 4
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Args:
+            path (Path): the sqlite file
+            max_bytes (int, optional): maximum size of the stored fragments
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__db = sqlite3.connect(str(path))
+        self.__init_schema()
+        self.__run = self.__db.execute('SELECT COALESCE(MAX(used), 0) + 1 FROM fragments'
+                                       ).fetchone()[0]
+        self.__templates = hashlib.sha256(''.join(
+            read_template(name) for name in FRAGMENT_TEMPLATES).encode('utf-8')).hexdigest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __init_schema(self):
+        version = self.__db.execute('PRAGMA user_version').fetchone()[0]
+        if version != self.VERSION:
+            self.__db.execute('DROP TABLE IF EXISTS fragments')
+            self.__db.execute(f'PRAGMA user_version = {self.VERSION:d}')
+        self.__db.execute('''CREATE TABLE IF NOT EXISTS fragments (
+                                key BLOB PRIMARY KEY,
+                                used INTEGER NOT NULL,
+                                svg TEXT NOT NULL)''')
+        self.__db.execute('CREATE INDEX IF NOT EXISTS fragments_used ON fragments (used)')
+
+    def close(self):
+        """Remove the least recently used fragments above the maximum size, write pending
+        changes and close the database
+        """
+        self.__evict()
+        self.__db.commit()
+        self.__db.close()
+        logging.info('fragment cache: %d hits, %d misses, %d evicted', self.hits, self.misses,
+                     self.evictions)
+
+    def key(self, *inputs: Any) -> bytes:
+        """
+        Args:
+            inputs (Any): everything the fragments of a tile are drawn from, which can be
+                written as json
+
+        Returns:
+            bytes: the key of the fragments of the tile
+        """
+        data = json.dumps([self.__templates, *inputs], sort_keys=True, default=str,
+                          separators=(',', ':'))
+        return hashlib.sha256(data.encode('utf-8')).digest()
+
+    def lookup(self, keys: Iterable[bytes]) -> Dict[bytes, Tuple[str, ...]]:
+        """Look for the fragments of tiles in the cache
+
+        Args:
+            keys (Iterable[bytes]): keys of the tiles, as returned by key()
+
+        Returns:
+            Dict[bytes, Tuple[str, ...]]: the fragments of each layer of the tiles found,
+            by key
+        """
+        keys = list(keys)
+        found = {}
+        for part in self.__parts(keys):
+            marks = ','.join('?' * len(part))
+            found.update((key, tuple(svg.split(LAYER_SEPARATOR))) for key, svg in
+                         self.__db.execute(f'SELECT key, svg FROM fragments WHERE key IN ({marks})',
+                                           part))
+            self.__db.execute(f'UPDATE fragments SET used = ? WHERE key IN ({marks})',
+                              [self.__run, *part])
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def store(self, fragments: Dict[bytes, Tuple[str, ...]]):
+        """Store drawn fragments
+
+        Args:
+            fragments (Dict[bytes, Tuple[str, ...]]): svg of each layer of tiles, by key
+        """
+        self.__db.executemany('REPLACE INTO fragments VALUES (?, ?, ?)',
+                              ((key, self.__run, LAYER_SEPARATOR.join(svg))
+                               for key, svg in fragments.items()))
+
+    def __evict(self):
+        size = self.__db.execute('SELECT COALESCE(SUM(LENGTH(svg)), 0) FROM fragments'
+                                 ).fetchone()[0]
+        if size <= self.max_bytes:
+            return
+        evicted = []
+        for key, length in self.__db.execute(
+                'SELECT key, LENGTH(svg) FROM fragments ORDER BY used'):
+            if size <= self.max_bytes:
+                break
+            evicted.append(key)
+            size -= length
+        for part in self.__parts(evicted):
+            self.__db.execute(f"DELETE FROM fragments WHERE key IN ({','.join('?' * len(part))})",
+                              part)
+        self.evictions += len(evicted)
+
+    @staticmethod
+    def __parts(keys: List[bytes]) -> Iterable[List[bytes]]:
+        return (keys[i:i + QUERY_SIZE] for i in range(0, len(keys), QUERY_SIZE))
@@ -2,17 +2,122 @@
 
 Render a full hex grid
 """
+import functools
+import io
+import logging
+import re
+from concurrent.futures import Executor
+from contextlib import nullcontext
 from string import Template
-from typing import Callable, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
 
-from shapely.geometry import MultiPolygon, Polygon
-from shapely.ops import unary_union
-
-from classes.hexagon_renderer import HexagonRenderer, draw_polygon
+from classes.fragment_cache import FragmentCache
+from classes.hexcoord import OccupancyIndex
+from classes.hexagon_renderer import Coordinate, HexagonRenderer, Icon, draw_rings
+from classes.templates import read_template
+from classes.terrain_regions import draw_terrain_regions
 from classes.tilemetadata import TileMetadata
+from classes.zone_outline import Ring, group_by_zone, zone_outlines
+
+
+@functools.lru_cache(maxsize=None)
+def canvas_templates() -> Tuple[Template, Template, Template]:
+    """The canvas is split around $defs and $content, so they can be written as a stream
+
+    Returns:
+        Tuple[Template, Template, Template]: the canvas before the defs, between the defs
+        and the content, and after the content
+    """
+    header, defs, footer = [Template(part) for part in
+                            re.split(r'\$(?:defs|content)\b', read_template('canvas'))]
+    return header, defs, footer
+
+
+def process_pool(jobs: int):
+    """
+    Args:
+        jobs (int): number of worker processes
+
+    Returns:
+        a ProcessPoolExecutor if there are several jobs, or else a context giving None.
+        Multiprocessing is only imported when it is used, as it is slow to import.
+    """
+    if jobs <= 1:
+        return nullcontext()
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(jobs)
+
+
+# Layers drawn for each tile, with the method of HexagonRenderer which draws a tile
+LAYERS = {'icons': 'load_icon', 'grid': 'draw_grid', 'numbers': 'draw_numbers',
+          'content': 'draw_content'}
+
+# Layers whose fragments are stored together in the FragmentCache, in the order they are
+# written. Icons are declared once per icon, not per tile.
+CACHED_LAYERS = ('content', 'grid', 'numbers')
+
+# Under this number of tiles to draw, a layer is drawn in the main process
+MIN_PARALLEL_TILES = 2000
+
+
+def draw_tiles(task: Tuple[Tuple[str, ...], List[TileMetadata], float, Dict[str, Any],
+                           Dict[str, Optional[Icon]]]) -> List[List[str]]:
+    """Draw some layers of some tiles. This function is used as a worker in the process pool,
+    so it must stay at module level.
+
+    Args:
+        task: layers, tiles, radius, other arguments of the HexagonRenderer and loaded icons
+
+    Returns:
+        List[List[str]]: for each layer, the svg of each tile in the order of the tiles
+    """
+    layers, tiles, radius, options, icons = task
+    hex_renderer = HexagonRenderer(radius, **options)
+    hex_renderer.icons_dict = icons
+    hex_renderer.compute_shapes(tiles)
+    return [[getattr(hex_renderer, LAYERS[layer])(tile) for tile in tiles]
+            for layer in layers]
+
+
+def compute_zones(tiles: Iterable[TileMetadata], radius: float) -> Dict[str, List[List[Ring]]]:
+    """Compute the outlines of the zones of some tiles, to draw a part of them with the zones
+    of the whole set (see the zones argument of Renderer)
+
+    Args:
+        tiles (Iterable[TileMetadata]): tiles
+        radius (float): radius of an hexagon
+
+    Returns:
+        Dict[str, List[List[Ring]]]: Outlines of the zones, as returned by zone_outlines, by zone
+    """
+    zone_tiles = {(tile.col, tile.row): tile for tile in tiles if tile.zones}
+    members = group_by_zone((coord, tile.zones) for coord, tile in zone_tiles.items())
+    hex_renderer = HexagonRenderer(radius)
+    hex_renderer.compute_shapes(zone_tiles.values())
+    return {zone: zone_outlines(coords, lambda coord: hex_renderer.compute_shape(
+        zone_tiles[coord]).hexagon_points) for zone, coords in members.items()}
+
+
+def add_border_tiles(tiles: List[TileMetadata]) -> List[TileMetadata]:
+    """Add empty tiles around the existing one, to have a nicer render
+
+    Args:
+        tiles (List[TileMetadata]): Liste of tiles from files
+
+    Returns:
+        List[TileMetadata]: The input tiles, then the empty tiles around them, by column and
+        row.
+    """
+
+    if len(tiles) == 0:
+        logging.error("No tiles found")
+        return [TileMetadata(0, 0)]
 
-with open('svg_templates/canvas.svg', 'r', encoding="utf-8") as cfile:
-    canvas_t = Template(cfile.read())
+    # Only tiles which are not given are created, with no content (they will be drawed with
+    # some default contents). Neighbors are found with arrays, without any object by neighbor.
+    border = OccupancyIndex([tile.col for tile in tiles], [tile.row for tile in tiles]).border()
+    return list(tiles) + [TileMetadata(col, row) for col, row in border]
 
 
 class Renderer:
@@ -22,18 +127,109 @@ class Renderer:
         ValueError: If there is no tiles to render
     """
 
-    # pylint: disable=too-few-public-methods
+    # pylint: disable=too-many-instance-attributes
     def __init__(self, tiles: List[TileMetadata], css: str,
-                 radius: float = 20) -> None:
+                 radius: float = 20, zones: Dict[str, List[List[Ring]]] = None, *,
+                 symbols: bool = False, compact: bool = False, jobs: int = 1,
+                 fragment_cache: Optional[FragmentCache] = None,
+                 terrain_regions: bool = False, numbers: bool = True) -> None:
+        """
+        Args:
+            tiles (List[TileMetadata]): tiles to draw
+            css (str): custom css
+            radius (float, optional): radius of an hexagon
+            zones (Dict[str, List[List[Ring]]], optional): Outlines of the zones, as returned by
+                zone_outlines, by zone. By default, they are computed from the tiles. It allows
+                to draw a part of a bigger map with the zones of the whole map.
+            symbols (bool, optional): Declare the hexagon and mixed terrain shapes once in the
+                defs, and draw each tile with references to them. The file is smaller.
+            compact (bool, optional): Write numbers with at most two decimals, without
+                trailing zeros.
+            jobs (int, optional): Number of processes drawing the layers of big maps. The
+                result doesn't depend on it.
+            fragment_cache (FragmentCache, optional): Persistent cache of the fragments of
+                tiles. Tiles found in it are not drawn again.
+            terrain_regions (bool, optional): Draw adjacent tiles with the same terrain, and
+                mixed terrain zones with the same terrain, as single polygons.
+            numbers (bool, optional): Draw the coordinates of each tile.
+        """
+        # pylint: disable=too-many-arguments
         if len(tiles) == 0:
             raise ValueError("No tiles to render")
 
-        self.hex_renderer = HexagonRenderer(radius)
+        self.hex_renderer = HexagonRenderer(radius, symbols, compact, terrain_regions)
+        self.jobs = jobs
+        self.fragment_cache = fragment_cache
+        self.numbers = numbers
+        # Arguments of the HexagonRenderer of the worker processes
+        self.__worker_args = (radius, {'symbols': symbols, 'compact': compact,
+                                       'terrain_regions': terrain_regions})
         self.strokewidth = radius / 15
-        self.fontsize = str(2.5 * radius) + "%"
+        self.fontsize = self.hex_renderer.fmt(2.5 * radius) + "%"
         self.css = css
         self.tiles = {(tile.col, tile.row): tile for tile in tiles}
+        self.hex_renderer.compute_shapes(self.tiles.values())
+
+        # Rendered svg of each tile, by layer, so only modified tiles are drawn again
+        self.__fragments: Dict[str, Dict[Tuple[int, int], str]] = {
+            layer: {} for layer in LAYERS}
+        # Rendered svg of each zone
+        self.__zones: Dict[str, List[str]] = {}
+        # Rendered svg of the terrain regions, drawn again when tiles change
+        self.__regions: Optional[List[str]] = None
+        self.__fixed_zones = zones is not None
+        if zones is not None:
+            self.__zones = self.__draw_fixed_zones(zones)
+
+        self.view_box = self.__compute_view_box()
+
+    def __draw_fixed_zones(self, zones: Dict[str, List[List[Ring]]]) -> Dict[str, List[str]]:
+        return {zone: [draw_rings(rings=polygon, css_class=f"zone {zone}",
+                                  fmt=self.hex_renderer.fmt)
+                       for polygon in polygons]
+                for zone, polygons in zones.items()}
+
+    def update_tiles(self, tiles: List[TileMetadata],
+                     zones: Dict[str, List[List[Ring]]] = None) -> None:
+        """Replace the tiles of the map. Only tiles which are new or whose content changed,
+        and zones which contain them, will be drawn again by the next draw_svg.
+
+        Args:
+            tiles (List[TileMetadata]): The new tiles of the map
+            zones (Dict[str, List[List[Ring]]], optional): New outlines of the zones, as in
+                the constructor. They replace the zones given to the constructor, if any.
+
+        Raises:
+            ValueError: If there is no tiles to render
+        """
+        if len(tiles) == 0:
+            raise ValueError("No tiles to render")
+
+        new_tiles = {(tile.col, tile.row): tile for tile in tiles}
+        dirty_zones = set()
+        for coord, tile in self.tiles.items():
+            new_tile = new_tiles.get(coord)
+            if new_tile is None:
+                for fragments in self.__fragments.values():
+                    fragments.pop(coord, None)
+                dirty_zones.update(tile.zones)
+            elif new_tile.content != tile.content:
+                self.__fragments['icons'].pop(coord, None)
+                self.__fragments['content'].pop(coord, None)
+                dirty_zones.update(set(tile.zones) ^ set(new_tile.zones))
+
+        dirty_zones.update(zone for coord, tile in new_tiles.items()
+                           if coord not in self.tiles for zone in tile.zones)
+        if zones is not None:
+            self.__fixed_zones = True
+            self.__zones = self.__draw_fixed_zones(zones)
+        elif not self.__fixed_zones:
+            for zone in dirty_zones:
+                self.__zones.pop(zone, None)
 
+        self.tiles = new_tiles
+        self.__regions = None
+        self.hex_renderer.compute_shapes(self.tiles.values())
         self.view_box = self.__compute_view_box()
 
     def __compute_view_box(self) -> Tuple[float, float, float, float]:
@@ -51,7 +247,7 @@ class Renderer:
                 x_max = x_1
             if not y_max or y_1 > y_max:
                 y_max = y_1
-        return (round(k) for k in (x_min - self.strokewidth,
+        return tuple(round(k) for k in (x_min - self.strokewidth,
                                    y_min - self.strokewidth,
                                    x_max - x_min + self.strokewidth*2,
                                    y_max - y_min + self.strokewidth * 2))
@@ -62,63 +258,132 @@ class Renderer:
         Returns:
             str: a simple, svg-formatted string that display the map
         """
-        defs = self.__load_icons()
-        layers = [
-            # First layers are on top of the elevation
-            self.__draw_zones(),
-            self.__draw_numbers(),
-            self.__draw_grid(),
-            self.__draw_content(),
-        ]
-        layers.reverse()
-
-        return canvas_t.substitute(defs=defs,
-                                   content='\n'.join(layers),
-                                   viewBox=" ".join([str(s)
-                                                    for s in self.view_box]),
-                                   strokegrid=self.strokewidth, strokefont=self.strokewidth /
-                                   float("1.5"),
-                                   strokepath=self.strokewidth *
-                                   float("1.2"),
-                                   fontsize=self.fontsize, css=self.css)
-
-    def __load_icons(self) -> str:
-        return "".join(sorted([self.hex_renderer.load_icon(tile)
-                               for tile in self.tiles.values()]))
-
-    def __draw_grid(self) -> str:
-        return "".join(sorted([self.hex_renderer.draw_grid(tile)
-                               for tile in self.tiles.values()]))
-
-    def __draw_numbers(self) -> str:
-        return "".join(sorted([self.hex_renderer.draw_numbers(tile)
-                               for tile in self.tiles.values()]))
-
-    def __draw_content(self) -> str:
-        return "".join(sorted([self.hex_renderer.draw_content(tile)
-                               for tile in self.tiles.values()]))
-
-    def __draw_zones(self) -> str:
-        declared_zones = {zone for tile in self.tiles.values()
-                          for zone in tile.zones}
-        return "".join(sorted([draw_polygon(polygon=polygon,
-                                            css_class=f"zone {z}")
-                               for z in declared_zones for polygon in
-                               self.__make_cluster(lambda h, zone=z: zone in h.zones)]))
-
-    def __make_cluster(self, cluster_checker: Callable[[TileMetadata], bool]) -> List[Polygon]:
-        """
-        Filters Hexagon of the grid and computes edge point of the cluster(s) border(s).
+        output = io.StringIO()
+        self.write_svg(output)
+        return output.getvalue()
+
+    def write_svg(self, output: TextIO) -> None:
+        """Write the svg of the map in a stream, layer by layer, so the whole map is never
+        built in memory. The result is the same as draw_svg.
+
         Args:
-            cluster_checker: lambda Hexagon ->boolean indicating members of the cluster
+            output (TextIO): an opened file
+        """
+        fmt = self.hex_renderer.fmt
+        values = {'viewBox': " ".join([str(s) for s in self.view_box]),
+                  'strokegrid': fmt(self.strokewidth),
+                  'strokefont': fmt(self.strokewidth / float("1.5")),
+                  'strokepath': fmt(self.strokewidth * float("1.2")),
+                  'fontsize': self.fontsize,
+                  'css': self.css}
+
+        canvas_header_t, canvas_defs_t, canvas_footer_t = canvas_templates()
+        output.write(canvas_header_t.substitute(values))
+        output.writelines(self.__load_icons())
+        output.write(canvas_defs_t.substitute(values))
+        if self.hex_renderer.terrain_regions:
+            if self.__regions is None:
+                self.__regions = draw_terrain_regions(self.tiles, self.hex_renderer)
+            output.writelines(self.__regions)
+            output.write('\n')
+        # Last layers are on top of the elevation
+        layers = CACHED_LAYERS if self.numbers else tuple(
+            layer for layer in CACHED_LAYERS if layer != 'numbers')
+        # Worker processes are only started if there are enough tiles to draw
+        with process_pool(self.jobs) as executor:
+            self.__draw_tiles(layers, executor)
+        for layer in layers:
+            output.writelines(sorted(self.__fragments[layer].values()))
+            output.write('\n')
+        output.writelines(self.__draw_zones())
+        output.write(canvas_footer_t.substitute(values))
 
-        Returns: One or several Point lists representing cluster(s) border(s).
+    def __draw_tiles(self, layers: Tuple[str, ...], executor: Optional[Executor] = None):
+        """Draw the fragments of the layers which are not drawn yet"""
+        missing = [(coord, tile) for coord, tile in self.tiles.items()
+                   if any(coord not in self.__fragments[layer] for layer in layers)]
+        keys = self.__load_cached_fragments(layers, missing)
+        if keys is not None:
+            missing = [(coord, tile) for coord, tile in missing if coord in keys]
+        if executor is None or len(missing) < MIN_PARALLEL_TILES:
+            for layer in layers:
+                fragments = self.__fragments[layer]
+                draw_tile = getattr(self.hex_renderer, LAYERS[layer])
+                for coord, tile in missing:
+                    if coord not in fragments:
+                        fragments[coord] = draw_tile(tile)
+        else:
+            self.__draw_tiles_in_workers(layers, missing, executor)
+        if keys:
+            self.fragment_cache.store({
+                keys[coord]: tuple(self.__fragments[layer][coord] for layer in CACHED_LAYERS)
+                for coord, _ in missing})
 
+    def __load_cached_fragments(self, layers: Tuple[str, ...],
+                                tiles: List[Tuple[Tuple[int, int], TileMetadata]]
+                                ) -> Optional[Dict[Tuple[int, int], bytes]]:
+        """Fill the fragments of the tiles found in the fragment cache
+
+        Returns:
+            Optional[Dict[Tuple[int, int], bytes]]: the keys of the tiles which were not found,
+            to store them once drawn, or None if the cache isn't used for these layers
         """
-        polygons = unary_union([self.hex_renderer.get_shape(
-            tile) for tile in self.tiles.values() if cluster_checker(tile)])
+        if self.fragment_cache is None or layers != CACHED_LAYERS:
+            return None
+        radius, options = self.__worker_args
+        settings = [radius, options]
+        # The content depends on the size and the position of the icon
+        keys = {coord: self.fragment_cache.key(settings, coord, tile.content,
+                                               self.__icon_placement(tile.icon))
+                for coord, tile in tiles}
+        found = self.fragment_cache.lookup(keys.values())
+        for coord, key in list(keys.items()):
+            if key in found:
+                for layer, fragment in zip(CACHED_LAYERS, found[key]):
+                    self.__fragments[layer].setdefault(coord, fragment)
+                del keys[coord]
+        return keys
+
+    def __icon_placement(self, icon_id: Optional[str]) -> Optional[Tuple[Any, ...]]:
+        icon = self.hex_renderer.icons_dict.get(icon_id) if icon_id else None
+        return (icon.icon_id, icon.origin.x, icon.origin.y, icon.scale) if icon else None
+
+    def __draw_tiles_in_workers(self, layers: Tuple[str, ...],
+                                tiles: List[Tuple[Tuple[int, int], TileMetadata]],
+                                executor: Executor):
+        # A few parts by process, so a slow part doesn't keep the other processes waiting.
+        # All layers of a part are drawn by the same task, so shapes are computed once.
+        size = -(-len(tiles) // (self.jobs * 4))
+        parts = [tiles[i:i + size] for i in range(0, len(tiles), size)]
+        radius, options = self.__worker_args
+        tasks = [(layers, [tile for _, tile in part], radius, options,
+                  self.hex_renderer.icons_dict) for part in parts]
+        for part, drawn in zip(parts, executor.map(draw_tiles, tasks)):
+            coords = [coord for coord, _ in part]
+            for layer, layer_drawn in zip(layers, drawn):
+                self.__fragments[layer].update(zip(coords, layer_drawn))
+
+    def __load_icons(self) -> List[str]:
+        # Each icon is declared once, whatever the number of tiles using it.
+        # Icons are loaded in the main process, since other layers use them.
+        self.__draw_tiles(('icons',))
+        icons = sorted(set(self.__fragments['icons'].values()))
+        if self.hex_renderer.symbols:
+            return [self.hex_renderer.symbol_defs()] + icons
+        return icons
 
-        if isinstance(polygons, MultiPolygon):
-            return [Polygon(geom) for geom in MultiPolygon(polygons).geoms]
+    def __draw_zones(self) -> List[str]:
+        if self.__fixed_zones:
+            return sorted([path for paths in self.__zones.values() for path in paths])
+        members = group_by_zone((coord, tile.zones) for coord, tile in self.tiles.items())
+        for zone in set(self.__zones) - set(members):
+            del self.__zones[zone]
+        for zone in set(members) - set(self.__zones):
+            self.__zones[zone] = [draw_rings(rings=polygon, css_class=f"zone {zone}",
+                                             fmt=self.hex_renderer.fmt)
+                                  for polygon in zone_outlines(members[zone],
+                                                               self.__hexagon_points)]
+        return sorted([path for paths in self.__zones.values() for path in paths])
 
-        return [polygons]
+    def __hexagon_points(self, coord: Tuple[int, int]) -> List[Coordinate]:
+        return self.hex_renderer.compute_shape(self.tiles[coord]).hexagon_points
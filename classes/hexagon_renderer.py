@@ -4,72 +4,199 @@ Render a single hex
 """
 import logging
 import math
-from pathlib import Path
-from string import Template
-from typing import Dict, List, Tuple
-from xml.dom import minidom
+from typing import (TYPE_CHECKING, Callable, Dict, Iterable, List, NamedTuple, Optional,
+                    Sequence, Tuple)
 
-from shapely.geometry import Point, Polygon
+from classes.templates import ICONS_DIR, template
+from classes.tilemetadata import Cardinal, TileMetadata, as_list
 
-from classes.tilemetadata import Cardinal, TileMetadata
+# numpy and minidom are slow to import, so they are imported when they are used
+if TYPE_CHECKING:
+    import numpy as np
 
-with open('svg_templates/text.svg', 'r', encoding="utf-8") as cfile:
-    text_t = Template(cfile.read())
+# Characters to escape in an attribute value, like xml.sax.saxutils.escape(value, {'"': ...})
+ATTRIBUTE_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
 
-with open('svg_templates/number.svg', 'r', encoding="utf-8") as cfile:
-    number_t = Template(cfile.read())
+# Id of the symbol of a whole hexagon. Mixed terrain zones are HEXAGON_SYMBOL-<cardinal>
+HEXAGON_SYMBOL = 'hexagon'
 
-with open('svg_templates/icon.svg', 'r', encoding="utf-8") as cfile:
-    icon_t = Template(cfile.read())
 
-with open('svg_templates/path.svg', 'r', encoding="utf-8") as cfile:
-    path_t = Template(cfile.read())
+class Coordinate(NamedTuple):
+    """A point of the map
+    """
+    x: float
+    y: float
+
+
+# Write a number in the svg
+NumberFormat = Callable[[float], str]
+
+
+def compact_number(value: float, digits: int = 2) -> str:
+    """Write a number with at most `digits` decimals, without trailing zeros:
+    12.0 is written 12, and 1086.3999999999999 is written 1086.4
+
+    Returns:
+        str: the shortest writing of the rounded number
+    """
+    text = str(value)
+    integer, _, decimals = text.partition('.')
+    if len(decimals) > digits or 'e' in text:
+        text = f"{value:.{digits}f}".rstrip('0')
+        integer, _, decimals = text.partition('.')
+    if decimals.strip('0') == '':
+        return '0' if integer == '-0' else integer
+    return text
 
 
-def points_to_polygon_coord(points: List[Point]) -> str:
-    """Write points as polygon coordinate
+def ring_to_path(coords: List[Tuple[float, float]], fmt: NumberFormat = str) -> str:
+    """Write the coordinates of a ring as a closed svg path
 
     Args:
-        points (List[Point]): List of point
+        coords (List[Tuple[float, float]]): coordinates of the ring, the last one being the first
+        fmt (NumberFormat, optional): how to write the coordinates
+
+    Returns:
+        str: a path, ready to be inserted in the d attribute of a svg path
+    """
+    points = [f"{fmt(x)},{fmt(y)}" for x, y in coords]
+    return f"M {points[0]} L {' L '.join(points[1:])} z"
+
+
+def draw_points(points: List[Tuple[float, float]], css_class: str, fmt: NumberFormat = str):
+    """Draw a closed path through points
 
     Returns:
-        str: List of coordinates ready to be inserted in svg polygon
+    string: svg code for the path
     """
-    return ' '.join(
-        [f"{point.x},{point.y}" for point in points])
+    return draw_path(ring_to_path([*points, points[0]], fmt), css_class)
 
 
-def draw_polygon(polygon: Polygon, css_class: str):
-    """Draw a polygon from SVG returned by shapely
+def draw_rings(rings: List[List[Tuple[float, float]]], css_class: str,
+               fmt: NumberFormat = str):
+    """Draw a polygon from its rings, the exterior first and then the holes.
+    The first point of a ring must not be repeated at its end.
 
     Returns:
-    string: svg code for a single hexagon
+    string: svg code for the path
     """
-    doc = minidom.parseString(polygon.svg())
-    path_dom = doc.getElementsByTagName("path")[0]
-    # remove unexpected attribute
-    to_be_removed = [k for k in path_dom.attributes.keys() if k not in [
-        'd']]
+    return draw_path(" ".join([ring_to_path([*ring, ring[0]], fmt) for ring in rings]),
+                     css_class)
+
 
-    # pylint: disable=expression-not-assigned
-    [path_dom.removeAttribute(k) for k in to_be_removed]
+def draw_path(path: str, css_class: str):
+    """
+    Returns:
+    string: svg code for a path from its d attribute
+    """
+    css_class = css_class.translate(ATTRIBUTE_ESCAPES)
+    return f'<path d="{path}" class="{css_class}"/>'
 
-    path_dom.setAttribute("class", css_class)
 
-    return path_dom.toxml()
+def draw_use(symbol_id: str, position: Coordinate, css_class: str, fmt: NumberFormat = str):
+    """
+    Returns:
+    string: svg code which draws a symbol declared in the defs at a position
+    """
+    return template('use').substitute(id=symbol_id, tx=fmt(position.x), ty=fmt(position.y),
+                                      css_class=css_class.translate(ATTRIBUTE_ESCAPES))
 
 
-def fixed_precision_point(p_x: float, p_y: float) -> Point:
+def fixed_precision_point(p_x: float, p_y: float) -> Coordinate:
     """
-    Round the coordinate and return a shapely.Point.
+    Round the coordinate.
 
     Returns:
-    Point: A point with less precision...
+    Coordinate: A point with less precision...
     """
     # Yes I know, it is bad... But float precision is may break clustering.
-    # Since we can't have more precision in shapely, having less is preferable and do the same ^^
     digits = 1
-    return Point(round(p_x, digits), round(p_y, digits))
+    return Coordinate(round(p_x, digits), round(p_y, digits))
+
+
+def fixed_precision_array(values: 'np.ndarray') -> 'np.ndarray':
+    """
+    Round coordinates to one decimal, with the same result as fixed_precision_point.
+
+    numpy rounds values * 10, which may differ from the builtin round when values * 10 is
+    close to a tie. Those values are rounded with the builtin round.
+
+    Returns:
+    np.ndarray: An array of coordinates with less precision
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    scaled = values * 10
+    result = np.round(scaled) / 10
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        result[ties] = [round(value, 1) for value in values[ties].tolist()]
+    return result
+
+
+# Order of the points computed by HexTemplate
+OUTER_CARDINALS = (Cardinal.E, Cardinal.NE, Cardinal.NW,
+                   Cardinal.W, Cardinal.SW, Cardinal.SE)
+PATH_CARDINALS = (Cardinal.N, Cardinal.NW, Cardinal.NE,
+                  Cardinal.S, Cardinal.SW, Cardinal.SE, Cardinal.C)
+
+
+class HexTemplate:
+    """Offsets of all points of an hexagon from its center, for a given radius.
+    It computes the points of many hexagons at once.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, radius: float, radius2: float) -> None:
+        self.radius = radius
+        self.radius2 = radius2
+        inner_radius = radius * 0.6
+        inner_radius2 = radius2 * 0.6
+        cosx = radius2 * 0.8660  # cos(pi/6)
+        # outer points, then inner points, then path points
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        self.offsets = np.array([
+            *self.__hexagon_offsets(radius, radius2),
+            *self.__hexagon_offsets(inner_radius, inner_radius2),
+            (0.0, -radius2),
+            (-cosx, -radius2 / 2),
+            (cosx, -radius2 / 2),
+            (0.0, radius2),
+            (-cosx, radius2 / 2),
+            (cosx, radius2 / 2),
+            (0.0, 0.0),
+        ])
+
+    @staticmethod
+    def __hexagon_offsets(radius: float, radius2: float) -> List[Tuple[float, float]]:
+        return [
+            (radius, 0.0),
+            (radius / 2, -radius2),
+            (-radius / 2, -radius2),
+            (-radius, 0.0),
+            (-radius / 2, radius2),
+            (radius / 2, radius2),
+        ]
+
+    def compute(self, cols: Sequence[int], rows: Sequence[int]) -> 'np.ndarray':
+        """Compute the center and the points of hexagons
+
+        Args:
+            cols (Sequence[int]): columns of the hexagons
+            rows (Sequence[int]): rows of the hexagons
+
+        Returns:
+            np.ndarray: an array of shape (hexagons, 1 + points, 2). For each hexagon,
+            the center is followed by the points in the order of self.offsets.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        cols = np.asarray(cols, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        centers = fixed_precision_array(np.stack([
+            self.radius * 1.5 * cols,
+            self.radius2 * 2 * rows + cols % 2 * self.radius2], axis=-1))
+        points = fixed_precision_array(centers[:, np.newaxis, :] + self.offsets)
+        return np.concatenate([centers[:, np.newaxis, :], points], axis=1)
 
 
 class TileShape:
@@ -78,161 +205,106 @@ class TileShape:
     Contains all required properties to draw an hexagon
 
     """
-    # pylint: disable=too-many-instance-attributes
 
-    def __init__(self, col: int, row: int, radius: float, radius2: float) -> None:
+    def __init__(self, col: int, row: int, radius: float, radius2: float,
+                 points: List[List[float]] = None) -> None:
+        # pylint: disable=too-many-arguments
         self.radius = radius
         self.radius2 = radius2
-        self.center = fixed_precision_point(self.radius * 1.5 * col,
-                                            self.radius2 *
-                                            2 * row + col % 2 * self.radius2)
-
-        self.outer_points = self.__create_outer_points()
-        self.inner_points = self.__create_inner_points()
-        self.path_points = self.__create_path_points()
-        self.shape = Polygon([self.outer_points[c] for c in [
-            Cardinal.E,
-            Cardinal.NE,
-            Cardinal.NW,
-            Cardinal.W,
-            Cardinal.SW,
-            Cardinal.SE]])
-        self.__zones = {}
+        if points is None:
+            points = HexTemplate(radius, radius2).compute([col], [row])[0].tolist()
+        points = list(map(Coordinate._make, points))
+
+        self.center = points[0]
+        self.outer_points = dict(zip(OUTER_CARDINALS, points[1:7]))
+        self.inner_points = dict(zip(OUTER_CARDINALS, points[7:13]))
+        self.path_points = dict(zip(PATH_CARDINALS, points[13:20]))
 
     @property
-    def bounding_box(self):
+    def hexagon_points(self) -> List[Coordinate]:
         """
         Returns:
-            tuple(float,float,float,float): the bouding box of the hexagon (xmin, ymin, xmax, ymax)
+            List[Coordinate]: the outer points of the hexagon
         """
-        return self.shape.bounds
+        return [self.outer_points[c] for c in OUTER_CARDINALS]
 
-    def get_zone(self, card: Cardinal) -> Polygon:
+    @property
+    def bounding_box(self):
         """
-        Get the polygon corresponding to a mixed zone
-        Args:
-            card (Cardinal): Cardinal of the mixed zone (NE, N, NW, SW, S or SE )
-
         Returns:
-            Polygon: A polygon correspondint to the shape of the zone
+            tuple(float,float,float,float): the bouding box of the hexagon (xmin, ymin, xmax, ymax)
         """
-        result = self.__zones.get(card)
-        if not result:
-            result = self.__compute_parts_polygon(card)
-            self.__zones[card] = result
-        return result
+        x_coords = [point.x for point in self.outer_points.values()]
+        y_coords = [point.y for point in self.outer_points.values()]
+        return (min(x_coords), min(y_coords), max(x_coords), max(y_coords))
 
-    def __create_outer_points(self) -> Dict[Cardinal, Point]:
-        radius = self.radius
-        radius2 = self.radius2
-        return {
-            Cardinal.E: fixed_precision_point(self.center.x + radius, self.center.y),
-            Cardinal.NE: fixed_precision_point(self.center.x + radius / 2, self.center.y - radius2),
-            Cardinal.NW: fixed_precision_point(self.center.x - radius / 2, self.center.y - radius2),
-            Cardinal.W: fixed_precision_point(self.center.x - radius, self.center.y),
-            Cardinal.SW: fixed_precision_point(self.center.x - radius / 2, self.center.y + radius2),
-            Cardinal.SE: fixed_precision_point(self.center.x + radius / 2, self.center.y + radius2),
-        }
-
-    def __create_inner_points(self) -> Dict[Cardinal, Point]:
-        radius = self.radius * 0.6
-        radius2 = self.radius2 * 0.6
-        return {
-            Cardinal.E: fixed_precision_point(self.center.x + radius, self.center.y),
-            Cardinal.NE: fixed_precision_point(self.center.x + radius / 2, self.center.y - radius2),
-            Cardinal.NW: fixed_precision_point(self.center.x - radius / 2, self.center.y - radius2),
-            Cardinal.W: fixed_precision_point(self.center.x - radius, self.center.y),
-            Cardinal.SW: fixed_precision_point(self.center.x - radius / 2, self.center.y + radius2),
-            Cardinal.SE: fixed_precision_point(self.center.x + radius / 2, self.center.y + radius2),
-        }
-
-    def __create_path_points(self) -> Dict[Cardinal, Point]:
-        radius2 = self.radius2
-        cosx = radius2 * 0.8660  # cos(pi/6)
-        coords = {
-            Cardinal.N: fixed_precision_point(self.center.x, self.center.y - radius2),
-            Cardinal.NW: fixed_precision_point(self.center.x - cosx, self.center.y - radius2 / 2),
-            Cardinal.NE: fixed_precision_point(self.center.x + cosx, self.center.y - radius2 / 2),
-            Cardinal.S: fixed_precision_point(self.center.x, self.center.y + radius2),
-            Cardinal.SW: fixed_precision_point(self.center.x - cosx, self.center.y + radius2 / 2),
-            Cardinal.SE: fixed_precision_point(self.center.x + cosx, self.center.y + radius2 / 2),
-            Cardinal.C: fixed_precision_point(self.center.x, self.center.y),
-        }
-        return coords
-
-    def __compute_parts_polygon(self, card: Cardinal) -> Polygon:
-        """Compute parts of polygon of one zone
+    def get_zone_points(self, card: Cardinal) -> List[Coordinate]:
+        """Compute points of the polygon of one zone
 
         Args:
-            side: side to compute
+            card (Cardinal): Cardinal of the mixed zone (NE, N, NW, SW, S or SE )
 
         Returns:
-            Polygon: The polygon of the side passed as argument
+            List[Coordinate]: The points of the polygon of the side passed as argument
         """
         # pylint: disable=too-many-return-statements
         if card is Cardinal.N:
-            return Polygon([
+            return [
                 self.pin(Cardinal.NE), self.pin(
                     Cardinal.NW), self.pout(Cardinal.NW), self.pout(Cardinal.NE),
-            ])
+            ]
         if card is Cardinal.NE:
-            return Polygon([
+            return [
                 self.pin(Cardinal.E), self.pin(
                     Cardinal.NE), self.pout(Cardinal.NE), self.pout(Cardinal.E),
-            ])
+            ]
         if card is Cardinal.SE:
-            return Polygon([
+            return [
                 self.pin(Cardinal.E), self.pin(
                     Cardinal.SE), self.pout(Cardinal.SE), self.pout(Cardinal.E),
-            ])
+            ]
         if card is Cardinal.S:
-            return Polygon([
+            return [
                 self.pin(Cardinal.SE), self.pin(
                     Cardinal.SW), self.pout(Cardinal.SW), self.pout(Cardinal.SE),
-            ])
+            ]
         if card is Cardinal.SW:
-            return Polygon([
+            return [
                 self.pin(Cardinal.W), self.pin(
                     Cardinal.SW), self.pout(Cardinal.SW), self.pout(Cardinal.W),
-            ])
+            ]
         if card is Cardinal.NW:
-            return Polygon([
+            return [
                 self.pin(Cardinal.W), self.pin(
                     Cardinal.NW), self.pout(Cardinal.NW), self.pout(Cardinal.W),
-            ])
+            ]
         if card is Cardinal.C:
-            return Polygon([self.inner_points[c] for c in [
-                Cardinal.E,
-                Cardinal.NE,
-                Cardinal.NW,
-                Cardinal.W,
-                Cardinal.SW,
-                Cardinal.SE]])
+            return [self.inner_points[c] for c in OUTER_CARDINALS]
 
         raise ValueError(f'No zone for this Cardinal: {card}')
 
-    def pin(self, card: Cardinal) -> Point:
+    def pin(self, card: Cardinal) -> Coordinate:
         """Access to an innerPoint through cardinal
 
         Args:
         card(Cardinal): Position of the point
 
         Returns:
-        Point: the expected point
+        Coordinate: the expected point
         """
         if card.pid() is None:
             return None
 
         return self.inner_points[card]
 
-    def pout(self, card: Cardinal) -> Point:
+    def pout(self, card: Cardinal) -> Coordinate:
         """Access to an innerPoint through cardinal
 
         Args:
         card(Cardinal): Position of the point
 
         Returns:
-        Point: the expected point
+        Coordinate: the expected point
         """
         if card.pid() is None:
             return None
@@ -247,37 +319,80 @@ class Icon:
     # pylint: disable=too-few-public-methods
 
     def __init__(self, icon_id: str,
-                 origin: Point, scale: float, svg_def: str) -> None:
+                 origin: Coordinate, scale: float, svg_def: str, *, scaled: bool = False) -> None:
+        """
+        Args:
+            icon_id (str): id of the icon in the defs
+            origin (Coordinate): center of the icon, once scaled
+            scale (float): scale of the icon
+            svg_def (str): declaration of the icon in the defs
+            scaled (bool, optional): True if the declaration is already scaled, so a tile only
+                gives the position of the icon
+        """
         # pylint: disable=too-many-arguments
         self.icon_id = icon_id
         self.scale = scale
         self.svg_def = svg_def
         self.origin = origin
+        self.scaled = scaled
 
-    def draw(self, translate_to: Point) -> str:
+    def draw(self, translate_to: Coordinate, compact: bool = False) -> str:
         """Draw the icon over the hex
 
         Args:
             translate_to (Decimal): offset where to translate the icon
+            compact (bool, optional): write numbers with compact_number
 
         Returns:
             str: a svg string correctly translated to be drawed over the map
         """
-        return icon_t.substitute(id=self.icon_id,
-                                 tx=translate_to.x - self.origin.x,
-                                 ty=translate_to.y - self.origin.y,
-                                 scale=self.scale)
+        if self.scaled:
+            return template('scaled_icon').substitute(
+                id=self.icon_id.translate(ATTRIBUTE_ESCAPES),
+                tx=compact_number(translate_to.x - self.origin.x),
+                ty=compact_number(translate_to.y - self.origin.y))
+        if compact:
+            return template('icon').substitute(
+                id=self.icon_id,
+                tx=compact_number(translate_to.x - self.origin.x),
+                ty=compact_number(translate_to.y - self.origin.y),
+                # The scale needs more digits than the coordinates
+                scale=compact_number(self.scale, 4))
+        return template('icon').substitute(id=self.icon_id,
+                                           tx=translate_to.x - self.origin.x,
+                                           ty=translate_to.y - self.origin.y,
+                                           scale=self.scale)
 
 
 class HexagonRenderer:
     """Render an hexagon
     """
 
-    def __init__(self, radius: float) -> None:
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, radius: float, symbols: bool = False, compact: bool = False,
+                 terrain_regions: bool = False) -> None:
+        """
+        Args:
+            radius (float): radius of an hexagon
+            symbols (bool, optional): Draw hexagons, mixed terrain zones and icons as
+                references to shapes declared once in the defs (see symbol_defs), instead of
+                full paths. Numbers are written like with compact.
+            compact (bool, optional): Write numbers with compact_number instead of their full
+                representation.
+            terrain_regions (bool, optional): Don't draw the terrain of tiles in
+                draw_content, since it is drawn by regions of tiles (see terrain_regions.py).
+        """
         self.__radius = radius
         self.__radius2 = math.sqrt(radius ** 2 - (radius / 2) ** 2)
+        self.__template = HexTemplate(self.__radius, self.__radius2)
+        self.symbols = symbols
+        self.compact = compact or symbols
+        self.terrain_regions = terrain_regions
+        self.fmt: NumberFormat = compact_number if self.compact else str
         self.__computed_points = {}
-        self.icons_dict = {}
+        # Icons by id, None for missing or invalid icons
+        self.icons_dict: Dict[str, Optional[Icon]] = {}
 
     def compute_shape(self, tile: TileMetadata) -> TileShape:
         """Compute the shape of an tile from its metadata.
@@ -292,49 +407,56 @@ class HexagonRenderer:
         result = self.__computed_points.get((tile.col, tile.row))
         if not result:
             result = TileShape(tile.col, tile.row,
-                               self.__radius, self.__radius2)
+                               self.__radius, self.__radius2,
+                               self.__template.compute([tile.col], [tile.row])[0].tolist())
             self.__computed_points[tile.col, tile.row] = result
 
         return result
 
-    def get_shape(self, tile: TileMetadata) -> Polygon:
-        """
-        Args:
-            tile (TileMetadata): a tile medata
+    def compute_shapes(self, tiles: Iterable[TileMetadata]) -> None:
+        """Compute the shapes of many tiles at once, which is much faster than
+        computing them one by one with compute_shape.
 
-        Returns:
-            Polygon: the shape of the tile metadata
+        Args:
+            tiles (Iterable[TileMetadata]): tiles whose shape will be needed
         """
-        return self.compute_shape(tile).shape
-
-    def get_coord_pos(self, tile: TileMetadata) -> Point:
+        coords = list({(tile.col, tile.row) for tile in tiles
+                       if (tile.col, tile.row) not in self.__computed_points})
+        if not coords:
+            return
+        cols, rows = zip(*coords)
+        for (col, row), points in zip(coords, self.__template.compute(cols, rows).tolist()):
+            self.__computed_points[col, row] = TileShape(col, row, self.__radius,
+                                                         self.__radius2, points)
+
+    def get_coord_pos(self, tile: TileMetadata) -> Coordinate:
         """
         Args:
             tile (TileMetadata): a tile medata
 
         Returns:
-            Point: The position of the coordinates
+            Coordinate: The position of the coordinates
         """
         return self.compute_shape(tile).inner_points[Cardinal.NW]
 
-    def get_zone(self, tile: TileMetadata, card: Cardinal) -> Polygon:
+    def get_zone_points(self, tile: TileMetadata, card: Cardinal) -> List[Coordinate]:
         """
         Args:
             tile (TileMetadata): a tile medata
             card (Cardinal): A position in the tile
 
         Returns:
-            Polygon: The shape of the polygon at the position.
+            List[Coordinate]: The points of the polygon at the position.
         """
-        return self.compute_shape(tile).get_zone(card)
+        return self.compute_shape(tile).get_zone_points(card)
 
-    def get_path_points(self, tile: TileMetadata) -> List[Point]:
+    def get_path_points(self, tile: TileMetadata) -> Dict[Cardinal, Coordinate]:
         """
         Args:
              tile (TileMetadata): a tile medata
 
         Returns:
-            List[Point]: The points used to pass path (to draw rivers and roads)
+            Dict[Cardinal, Coordinate]: The points used to pass path (to draw rivers and roads)
         """
         return self.compute_shape(tile).path_points
 
@@ -351,24 +473,33 @@ class HexagonRenderer:
     def load_icon(self, tile: TileMetadata) -> str:
         """
         Loads icons and return defs to avoid multiple declaration of heavy icons.
+        Each icon file is parsed once, missing or invalid icons are remembered too.
         Args:
              tile (TileMetadata): a tile medata
 
         Returns:
             str: a defs to insert in <defs></defs> in the svg file
         """
-        # pylint: disable=too-many-locals
         if not tile.icon:
             return ""
 
-        icon_path = Path(
-            'svg_templates/icons').joinpath(tile.icon + ".svg")
+        if tile.icon not in self.icons_dict:
+            self.icons_dict[tile.icon] = self.__parse_icon(tile.icon)
+
+        icon = self.icons_dict[tile.icon]
+        return icon.svg_def if icon else ""
+
+    def __parse_icon(self, icon_id: str) -> Optional[Icon]:
+        # pylint: disable=too-many-locals
+        icon_path = ICONS_DIR.joinpath(icon_id + ".svg")
         if not icon_path.is_file():
             # Don't print an error message for missing terrain icon. It's usually normal.
-            if not tile.icon.startswith("terrain"):
+            if not icon_id.startswith("terrain"):
                 logging.warning(
-                    "%s is not a valid icon (icon path '%s' isn't a file)", tile.icon, icon_path)
-            return ""
+                    "%s is not a valid icon (icon path '%s' isn't a file)", icon_id, icon_path)
+            return None
+
+        from xml.dom import minidom  # pylint: disable=import-outside-toplevel
 
         # extract inner svg
         with open(icon_path, 'r', encoding="UTF-8") as icon_file:
@@ -382,19 +513,41 @@ class HexagonRenderer:
 
                 scale = self.__radius2 / max_box / float(1.1)
                 svg_dom.removeAttribute('viewBox')
-                svg_dom.setAttribute("id", tile.icon)
+                if not self.symbols:
+                    svg_dom.setAttribute("id", icon_id)
                 svg_dom.setAttribute("class", " ".join(
-                    ["icon"] + tile.icon.split("/")))
+                    ["icon"] + icon_id.split("/")))
                 origin = fixed_precision_point(scale * (x_1 - x_0) / 2,
                                                scale * (y_1 - y_0) / 2)
-                icon = Icon(tile.icon, origin, scale, svg_dom.toxml())
-                self.icons_dict[tile.icon] = icon
-                return icon.svg_def
+                if self.symbols:
+                    # The scale is declared once, each tile only gives the position
+                    scale_text = compact_number(scale, 4)
+                    escaped_id = icon_id.translate(ATTRIBUTE_ESCAPES)
+                    return Icon(icon_id, origin, scale,
+                                f'<g id="{escaped_id}" transform="scale({scale_text} '
+                                f'{scale_text})">{svg_dom.toxml()}</g>', scaled=True)
+                return Icon(icon_id, origin, scale, svg_dom.toxml())
             except Exception as exception:  # pylint: disable=broad-except
                 logging.warning("icon format not supported (error=%s)",
                                 exception, exc_info=True)
 
-        return ""
+        return None
+
+    def symbol_defs(self) -> str:
+        """Declare the shapes drawn by tiles in symbols mode: an hexagon and each mixed
+        terrain zone, centered on the origin
+
+        Returns:
+        string: svg code to insert in the defs
+        """
+        origin = TileShape(0, 0, self.__radius, self.__radius2,
+                           [[0.0, 0.0], *self.__template.offsets.tolist()])
+        shapes = [(HEXAGON_SYMBOL, origin.hexagon_points)] + [
+            (f"{HEXAGON_SYMBOL}-{card.name}", origin.get_zone_points(card))
+            for card in Cardinal if Cardinal.valid_zone(card)]
+        defs = [f'<path id="{symbol_id}" d="{ring_to_path([*points, points[0]], self.fmt)}"/>'
+                for symbol_id, points in shapes]
+        return ''.join(defs)
 
     def draw_grid(self, tile: TileMetadata) -> str:
         """Draw the grid for an hexagon
@@ -402,10 +555,11 @@ class HexagonRenderer:
         Returns:
         string: svg code for a single hexagon
         """
-
-        return draw_polygon(polygon=self.get_shape(tile),
-                            css_class="grid"
-                            )
+        if self.symbols:
+            return draw_use(HEXAGON_SYMBOL, self.compute_shape(tile).center, "grid", self.fmt)
+        return draw_points(points=self.compute_shape(tile).hexagon_points,
+                           css_class="grid", fmt=self.fmt
+                           )
 
     def draw_numbers(self, tile: TileMetadata) -> str:
         """draw the number of an hexagon
@@ -415,8 +569,28 @@ class HexagonRenderer:
         """
 
         position = self.get_coord_pos(tile)
-        return number_t.substitute(
-            left=position.x, top=position.y, row=tile.row, col=tile.col)
+        return template('number').substitute(
+            left=self.fmt(position.x), top=self.fmt(position.y), row=tile.row, col=tile.col)
+
+    @staticmethod
+    def terrain(tile: TileMetadata) -> Tuple[str, List[Tuple[str, List[Cardinal]]]]:
+        """Read the terrain of a tile
+
+        Args:
+            tile (TileMetadata): a tile medata
+
+        Returns:
+            Tuple[str, List[Tuple[str, List[Cardinal]]]]: The css class of the base terrain,
+            and the css class and the sides of each mixed terrain
+        """
+        if not tile.content:
+            return '', []
+        terrain = tile.content.get('terrain', {})
+        mixed_terrains = [(mixed.get('type', 'unknown'),
+                           [Cardinal[side] for side in as_list(mixed.get('sides', []))
+                            if Cardinal.valid_zone(side)])
+                          for mixed in terrain.get('mixed', [])]
+        return terrain.get('type', 'unknown').lower(), mixed_terrains
 
     def draw_content(self, tile: TileMetadata):
         # pylint: disable=too-many-locals
@@ -427,34 +601,33 @@ class HexagonRenderer:
         """
 
         # Read metadata
-        terrain_css = ''
-        mixed_terrains = []
-        alt = None
-        if tile.content:
-            terrain = tile.content.get(
-                'terrain', {}).get('type', 'unknown')
-            terrain_css = terrain.lower()
-            mixed_terrains = tile.content.get(
-                'terrain', {}).get('mixed', [])
-            alt = tile.content.get('alt', None)
+        terrain_css, mixed_terrains = self.terrain(tile)
+        alt = tile.content.get('alt', None) if tile.content else None
 
         # base terrain
-        base_terrain = draw_polygon(
-            polygon=self.get_shape(tile),
-            css_class=f"terrain {terrain_css}"
-        )
+        shape = self.compute_shape(tile)
+        if self.terrain_regions:
+            base_terrain = ''
+        elif self.symbols:
+            base_terrain = draw_use(HEXAGON_SYMBOL, shape.center, f"terrain {terrain_css}",
+                                    self.fmt)
+        else:
+            base_terrain = draw_points(
+                points=shape.hexagon_points,
+                css_class=f"terrain {terrain_css}", fmt=self.fmt
+            )
 
         # mixed terrain
         mixed_terrain = ''
-        for terrain in mixed_terrains:
-            type_css = terrain.get('type', 'unknown')
-            polygons: List[Polygon] = [self.get_zone(tile, Cardinal[side]) for side in terrain.get(
-                'sides', []) if Cardinal.valid_zone(side)]
-
-            for polygon in polygons:
-                mixed_terrain += draw_polygon(polygon=polygon,
-                                              css_class=f"terrain {type_css}"
-                                              )
+        for type_css, sides in mixed_terrains if not self.terrain_regions else []:
+            for side in sides:
+                if self.symbols:
+                    mixed_terrain += draw_use(f"{HEXAGON_SYMBOL}-{side.name}", shape.center,
+                                              f"terrain {type_css}", self.fmt)
+                else:
+                    mixed_terrain += draw_points(points=shape.get_zone_points(side),
+                                                 css_class=f"terrain {type_css}", fmt=self.fmt
+                                                 )
 
         # Text or icon
         center = self.get_path_points(tile)[Cardinal.C]
@@ -462,11 +635,11 @@ class HexagonRenderer:
         if tile.icon:
             the_icon = self.icons_dict.get(tile.icon, None)
             if the_icon:
-                text = the_icon.draw(center)
+                text = the_icon.draw(center, self.compact)
 
         if len(text) == 0 and alt:
-            text = text_t.substitute(
-                cx=center.x, cy=center.y, text=alt)
+            text = template('text').substitute(
+                cx=self.fmt(center.x), cy=self.fmt(center.y), text=alt)
 
         road = self.__compute_path(tile, 'roads')
         river = self.__compute_path(tile, 'rivers')
@@ -477,8 +650,7 @@ class HexagonRenderer:
         paths = []
         result = ''
         if tile.content:
-            paths = tile.content.get(
-                type_of_path, [])
+            paths = as_list(tile.content.get(type_of_path, []))
 
         path_points = self.get_path_points(tile)
 
@@ -489,10 +661,11 @@ class HexagonRenderer:
                 ]
                     for k in path.split()]
                 center = path_points[Cardinal.C]
-                result += path_t.substitute(type=type_of_path,
-                                            bx=first.x, by=first.y,
-                                            ex=last.x, ey=last.y,
-                                            cx=center.x, cy=center.y)
+                result += template('path').substitute(
+                    type=type_of_path,
+                    bx=self.fmt(first.x), by=self.fmt(first.y),
+                    ex=self.fmt(last.x), ey=self.fmt(last.y),
+                    cx=self.fmt(center.x), cy=self.fmt(center.y))
             except Exception as exception:   # pylint: disable=broad-except
                 logging.warning(
                     "Warning: fail compute %s '%s' (error=%s)",
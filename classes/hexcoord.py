@@ -0,0 +1,298 @@
+"""hexcoord.py
+
+Coordinates of the hexagons of a map. Tiles are identified by (col, row), odd columns being
+shifted down by half a tile. Axial coordinates (q, r) make distances, rings and the rounding
+of points simple. Queries on many tiles use numpy arrays, which is much faster on big maps.
+"""
+from typing import Iterable, List, Sequence, Tuple
+
+Coord = Tuple[int, int]
+
+# Neighbor of a tile through each of its edges, for even and odd columns (odd columns are
+# shifted down). Edge i goes from outer point i to outer point i + 1, outer points being in
+# the order E, NE, NW, W, SW, SE.
+NEIGHBOR_OFFSETS = (
+    ((1, -1), (0, -1), (-1, -1), (-1, 0), (0, 1), (1, 0)),
+    ((1, 0), (0, -1), (-1, 0), (-1, 1), (0, 1), (1, 1)),
+)
+
+# Neighbors of an hexagon in axial coordinates, in the order of the edges
+AXIAL_DIRECTIONS = ((1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1), (1, 0))
+
+# Coordinates are packed in a single integer by OccupancyIndex: they must be in
+# ]-COORD_BIAS, COORD_BIAS[
+COORD_BIAS = 2 ** 30
+
+
+def neighbor(coord: Coord, edge: int) -> Coord:
+    """
+    Args:
+        coord (Coord): (col, row) of a tile
+        edge (int): an edge of the tile, from 0 to 5
+
+    Returns:
+        Coord: (col, row) of the tile on the other side of the edge
+    """
+    d_col, d_row = NEIGHBOR_OFFSETS[coord[0] % 2][edge]
+    return (coord[0] + d_col, coord[1] + d_row)
+
+
+def neighbors(coord: Coord) -> List[Coord]:
+    """
+    Args:
+        coord (Coord): (col, row) of a tile
+
+    Returns:
+        List[Coord]: the six tiles around it, in the order of the edges
+    """
+    col, row = coord
+    return [(col + d_col, row + d_row) for d_col, d_row in NEIGHBOR_OFFSETS[col % 2]]
+
+
+def offset_to_axial(coord: Coord) -> Tuple[int, int]:
+    """
+    Args:
+        coord (Coord): (col, row) of a tile
+
+    Returns:
+        Tuple[int, int]: (q, r) axial coordinates of the tile
+    """
+    col, row = coord
+    return col, row - (col - (col & 1)) // 2
+
+
+def axial_to_offset(q: int, r: int) -> Coord:
+    """
+    Args:
+        q (int): axial column
+        r (int): axial row
+
+    Returns:
+        Coord: (col, row) of the tile
+    """
+    return q, r + (q - (q & 1)) // 2
+
+
+def axial_round(q: float, r: float) -> Tuple[int, int]:
+    """Find the hexagon containing a point given in fractional axial coordinates
+
+    Args:
+        q (float): axial column
+        r (float): axial row
+
+    Returns:
+        Tuple[int, int]: (q, r) of the nearest hexagon
+    """
+    s = -q - r
+    rounded_q, rounded_r, rounded_s = round(q), round(r), round(s)
+    diff_q, diff_r, diff_s = abs(rounded_q - q), abs(rounded_r - r), abs(rounded_s - s)
+    if diff_q > diff_r and diff_q > diff_s:
+        rounded_q = -rounded_r - rounded_s
+    elif diff_r > diff_s:
+        rounded_r = -rounded_q - rounded_s
+    return rounded_q, rounded_r
+
+
+def distance(coord_a: Coord, coord_b: Coord) -> int:
+    """
+    Returns:
+        int: the number of steps between two tiles
+    """
+    q_a, r_a = offset_to_axial(coord_a)
+    q_b, r_b = offset_to_axial(coord_b)
+    return (abs(q_a - q_b) + abs(r_a - r_b) + abs(q_a + r_a - q_b - r_b)) // 2
+
+
+def hex_ring(center: Coord, radius: int) -> List[Coord]:
+    """
+    Args:
+        center (Coord): (col, row) of a tile
+        radius (int): distance to the tile
+
+    Returns:
+        List[Coord]: the tiles at this distance of the center, turning around it
+    """
+    if radius == 0:
+        return [center]
+    q, r = offset_to_axial(center)
+    q, r = q + AXIAL_DIRECTIONS[3][0] * radius, r + AXIAL_DIRECTIONS[3][1] * radius
+    ring = []
+    for d_q, d_r in AXIAL_DIRECTIONS[5:] + AXIAL_DIRECTIONS[:5]:
+        for _ in range(radius):
+            ring.append(axial_to_offset(q, r))
+            q, r = q + d_q, r + d_r
+    return ring
+
+
+def hex_range(center: Coord, radius: int) -> List[Coord]:
+    """
+    Args:
+        center (Coord): (col, row) of a tile
+        radius (int): maximum distance to the tile
+
+    Returns:
+        List[Coord]: the tiles at most at this distance of the center, by column and row
+    """
+    q, r = offset_to_axial(center)
+    return sorted(axial_to_offset(q + d_q, r + d_r)
+                  for d_q in range(-radius, radius + 1)
+                  for d_r in range(max(-radius, -d_q - radius), min(radius, -d_q + radius) + 1))
+
+
+def neighbor_arrays(cols: 'np.ndarray', rows: 'np.ndarray'
+                    ) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Compute the neighbors of many tiles at once
+
+    Args:
+        cols (np.ndarray): columns of the tiles
+        rows (np.ndarray): rows of the tiles
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: columns and rows of the neighbors, of shape
+        (tiles, 6), in the order of the edges
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    offsets = np.array(NEIGHBOR_OFFSETS, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    rows = np.asarray(rows, dtype=np.int64)
+    by_parity = offsets[cols % 2]
+    return cols[:, np.newaxis] + by_parity[:, :, 0], rows[:, np.newaxis] + by_parity[:, :, 1]
+
+
+def sorted_unique(keys: 'np.ndarray') -> 'np.ndarray':
+    """Sort and deduplicate integers. It is much faster than np.unique, which also
+    supports other types.
+
+    Args:
+        keys (np.ndarray): integers, of any shape
+
+    Returns:
+        np.ndarray: the distinct values, sorted, as a flat array
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    keys = np.sort(keys, axis=None)
+    distinct = np.empty(keys.shape, dtype=bool)
+    distinct[:1] = True
+    np.not_equal(keys[1:], keys[:-1], out=distinct[1:])
+    return keys[distinct]
+
+
+class OccupancyIndex:
+    """The set of occupied tiles of a map, stored as a sorted array of packed coordinates,
+    so membership of many tiles is tested at once without building python objects.
+    """
+
+    def __init__(self, cols: Sequence[int], rows: Sequence[int]) -> None:
+        """
+        Args:
+            cols (Sequence[int]): columns of the occupied tiles
+            rows (Sequence[int]): rows of the occupied tiles
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        self.__keys = sorted_unique(self.pack(np.asarray(cols, dtype=np.int64),
+                                              np.asarray(rows, dtype=np.int64)))
+
+    @staticmethod
+    def from_coords(coords: Iterable[Coord]) -> 'OccupancyIndex':
+        """
+        Args:
+            coords (Iterable[Coord]): (col, row) of the occupied tiles
+
+        Returns:
+            OccupancyIndex: the index of these tiles
+        """
+        coords = list(coords)
+        return OccupancyIndex([col for col, _ in coords], [row for _, row in coords])
+
+    @staticmethod
+    def pack(cols: 'np.ndarray', rows: 'np.ndarray') -> 'np.ndarray':
+        """
+        Returns:
+            np.ndarray: the coordinates packed in single integers, sorted like (col, row)
+        """
+        return (cols + COORD_BIAS) * (2 * COORD_BIAS) + (rows + COORD_BIAS)
+
+    @staticmethod
+    def unpack(keys: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: columns and rows of packed coordinates
+        """
+        return keys // (2 * COORD_BIAS) - COORD_BIAS, keys % (2 * COORD_BIAS) - COORD_BIAS
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def __contains__(self, coord: Coord) -> bool:
+        return bool(self.contains([coord[0]], [coord[1]])[0])
+
+    def contains(self, cols: Sequence[int], rows: Sequence[int]) -> 'np.ndarray':
+        """
+        Args:
+            cols (Sequence[int]): columns of tiles
+            rows (Sequence[int]): rows of tiles, of the same shape
+
+        Returns:
+            np.ndarray: for each tile, True if it is occupied
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        return self.__find(self.pack(np.asarray(cols, dtype=np.int64),
+                                     np.asarray(rows, dtype=np.int64)))
+
+    def __find(self, keys: 'np.ndarray') -> 'np.ndarray':
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        if self.__keys.size == 0:
+            return np.zeros(keys.shape, dtype=bool)
+        found = np.minimum(np.searchsorted(self.__keys, keys), len(self.__keys) - 1)
+        return self.__keys[found] == keys
+
+    def coords(self) -> List[Coord]:
+        """
+        Returns:
+            List[Coord]: the occupied tiles, by column and row
+        """
+        cols, rows = self.unpack(self.__keys)
+        return list(zip(cols.tolist(), rows.tolist()))
+
+    def neighbor_mask(self, cols: Sequence[int], rows: Sequence[int]) -> 'np.ndarray':
+        """
+        Args:
+            cols (Sequence[int]): columns of tiles
+            rows (Sequence[int]): rows of tiles
+
+        Returns:
+            np.ndarray: of shape (tiles, 6), True where the neighbor through an edge is
+            occupied
+        """
+        return self.contains(*neighbor_arrays(cols, rows))
+
+    def border(self) -> List[Coord]:
+        """
+        Returns:
+            List[Coord]: the tiles which are not occupied but next to an occupied one, by
+            column and row
+        """
+        cols, rows = neighbor_arrays(*self.unpack(self.__keys))
+        # By edge, the neighbors are already sorted like the tiles, so sorting is fast
+        keys = sorted_unique(self.pack(cols.T, rows.T))
+        border_cols, border_rows = self.unpack(keys[~self.__find(keys)])
+        return list(zip(border_cols.tolist(), border_rows.tolist()))
+
+    def ring(self, center: Coord, radius: int) -> List[Coord]:
+        """
+        Returns:
+            List[Coord]: the occupied tiles at a distance of the center, turning around it
+        """
+        ring = hex_ring(center, radius)
+        found = self.contains([col for col, _ in ring], [row for _, row in ring])
+        return [coord for coord, occupied in zip(ring, found.tolist()) if occupied]
+
+    def range(self, center: Coord, radius: int) -> List[Coord]:
+        """
+        Returns:
+            List[Coord]: the occupied tiles at most at a distance of the center, by column
+            and row
+        """
+        tiles = hex_range(center, radius)
+        found = self.contains([col for col, _ in tiles], [row for _, row in tiles])
+        return [coord for coord, occupied in zip(tiles, found.tolist()) if occupied]
@@ -0,0 +1,179 @@
+"""lod_export.py
+
+Render a map at several levels of detail, for viewers which show a zoomed out map with a
+lighter file. The first level is the full map. The next one keeps every tile but drops the
+numbers, icons, texts, roads and rivers. Each coarser level groups the tiles in hexagons twice
+as large, drawn with the most common terrain of their tiles.
+
+All levels are computed from the same parsed tiles, and share the same coordinates: a point
+of the map is at the same place in the view box of every level.
+"""
+import json
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+from classes.grid_renderer import Renderer, add_border_tiles
+from classes.hexagon_renderer import HexagonRenderer
+from classes.hexcoord import Coord, axial_round, axial_to_offset
+from classes.svg_file import open_svg
+from classes.tilemetadata import TileMetadata
+
+
+def parse_levels(value: str) -> int:
+    """Parse the number of levels of detail
+
+    Args:
+        value (str): a positive number
+
+    Raises:
+        ValueError: if the value isn't a valid number of levels
+
+    Returns:
+        int: the number of levels
+    """
+    levels = int(value)
+    if levels <= 0:
+        raise ValueError(f'{value} is not a valid number of levels')
+    return levels
+
+
+def level_factor(level: int) -> int:
+    """
+    Args:
+        level (int): a level of detail, 0 being the full map
+
+    Returns:
+        int: the size of the hexagons of the level, relative to the hexagons of the map
+    """
+    return 1 if level <= 1 else 2 ** (level - 1)
+
+
+def strip_details(tile: TileMetadata) -> TileMetadata:
+    """
+    Args:
+        tile (TileMetadata): a tile of the map
+
+    Returns:
+        TileMetadata: the tile with only its terrain and its zones, and no icon
+    """
+    if not tile.content:
+        return tile
+    content = {key: tile.content[key] for key in ('terrain', 'zone') if key in tile.content}
+    stripped = TileMetadata(tile.col, tile.row, content)
+    stripped.icon = None
+    return stripped
+
+
+def super_cell(col: int, row: int, factor: int) -> Coord:
+    """Find the hexagon of a coarse level which contains the center of a tile. Coarse
+    hexagons are laid out like tiles, with a radius `factor` times bigger.
+
+    Args:
+        col (int): column of the tile
+        row (int): row of the tile
+        factor (int): size of the coarse hexagons, relative to the tiles
+
+    Returns:
+        Coord: (col, row) of the coarse hexagon
+    """
+    # Center of the tile, for hexagons of radius 1
+    x = 1.5 * col
+    y = math.sqrt(3) * (row + (col % 2) / 2)
+    # Axial coordinates of the center, in coarse hexagons
+    q = x * 2 / 3 / factor
+    r = (-x / 3 + y * math.sqrt(3) / 3) / factor
+    return axial_to_offset(*axial_round(q, r))
+
+
+def aggregate_tiles(tiles: Iterable[TileMetadata], factor: int) -> List[TileMetadata]:
+    """Group tiles in coarse hexagons. A coarse hexagon gets the most common base terrain of
+    its tiles, and the zones of at least half of them. Mixed terrains, icons and other
+    details are dropped.
+
+    Args:
+        tiles (Iterable[TileMetadata]): tiles of the map, without border tiles
+        factor (int): size of the coarse hexagons, relative to the tiles
+
+    Returns:
+        List[TileMetadata]: the coarse hexagons, as tiles
+    """
+    cells: Dict[Coord, List[TileMetadata]] = {}
+    # Sorted, so ties between terrains are always won by the same one
+    for tile in sorted(tiles, key=lambda tile: (tile.col, tile.row)):
+        if tile.content:
+            cells.setdefault(super_cell(tile.col, tile.row, factor), []).append(tile)
+
+    result = []
+    for (col, row), members in cells.items():
+        terrains = Counter(HexagonRenderer.terrain(tile)[0] for tile in members)
+        zones = Counter(zone for tile in members for zone in set(tile.zones))
+        content: Dict[str, Any] = {'terrain': {'type': terrains.most_common(1)[0][0]}}
+        majority = sorted(zone for zone, count in zones.items() if 2 * count >= len(members))
+        if majority:
+            content['zone'] = majority
+        cell = TileMetadata(col, row, content)
+        cell.icon = None
+        result.append(cell)
+    return result
+
+
+def level_tiles(tiles: List[TileMetadata], level: int) -> List[TileMetadata]:
+    """
+    Args:
+        tiles (List[TileMetadata]): tiles of the map, without border tiles
+        level (int): a level of detail, 0 being the full map
+
+    Returns:
+        List[TileMetadata]: tiles to draw at this level, without border tiles
+    """
+    if level == 0:
+        return tiles
+    if level == 1:
+        return [strip_details(tile) for tile in tiles]
+    return aggregate_tiles(tiles, level_factor(level))
+
+
+def export_levels(tiles: List[TileMetadata], output_dir: Path, prefix: str, css: str,
+                  radius: float, *, levels: int, suffix: str = '.svg', **options) -> Path:
+    """Render the map at several levels of detail, each one in its own svg file, and write a
+    manifest describing them.
+
+    Args:
+        tiles (List[TileMetadata]): tiles of the map, without border tiles
+        output_dir (Path): directory of the levels and the manifest
+        prefix (str): prefix of the generated files
+        css (str): custom css
+        radius (float): radius of an hexagon of the full map
+        levels (int): number of levels
+        suffix (str, optional): extension of the levels, '.svg' or '.svgz'
+        options: other arguments of the Renderer (symbols, compact, jobs, fragment_cache...)
+
+    Returns:
+        Path: the manifest file
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    output_dir = Path(output_dir)
+    entries = []
+    for level in range(levels):
+        factor = level_factor(level)
+        drawn = add_border_tiles(level_tiles(tiles, level))
+        renderer = Renderer(drawn, css, radius * factor, numbers=level == 0, **options)
+        filename = output_dir.joinpath(f'{prefix}-lod{level}{suffix}')
+        with open_svg(filename) as ofile:
+            renderer.write_svg(ofile)
+        entries.append({
+            'level': level,
+            'file': filename.name,
+            'factor': factor,
+            'radius': radius * factor,
+            'details': level == 0,
+            'tiles': len(drawn),
+            'view_box': list(renderer.view_box),
+        })
+
+    manifest_file = output_dir.joinpath(f'{prefix}.json')
+    with open(manifest_file, 'w', encoding="utf-8") as mfile:
+        json.dump({'radius': radius, 'levels': entries}, mfile, indent=2)
+    return manifest_file
@@ -0,0 +1,285 @@
+"""map_pack.py
+
+Compile the tiles of a map in a single binary file, which is read with mmap instead of
+parsing every file of the vault. Only the parts of the file describing the loaded tiles are
+read, so loading a viewport of a big map touches a few pages.
+
+Layout of a pack, in little endian:
+- the header (see HEADER)
+- the string table: the offsets of the strings in the file (count + 1 unsigned 64-bit
+  integers), then the strings in utf-8. Terrains, icons, zones, texts, sides, roads and
+  rivers are stored once, and referenced by their index in the table.
+- the index: the packed (col, row) of each tile (see OccupancyIndex.pack), sorted, as
+  signed 64-bit integers, then the offset of the record of each tile, as unsigned 64-bit
+  integers
+- the records of the tiles (see RECORD): the fixed part, then the strings of the zones, roads
+  and rivers, then each mixed terrain with its sides.
+"""
+import mmap
+import struct
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from classes.hexcoord import OccupancyIndex
+from classes.tilemetadata import TileMetadata, as_list
+from classes.viewport import Viewport
+
+PACK_SUFFIX = '.hexpack'
+MAGIC = b'HEXPACK\0'
+VERSION = 2
+
+# magic, version, number of strings, number of tiles, position of the string offsets,
+# of the index keys, of the record offsets
+HEADER = struct.Struct('<8sIIQQQQ')
+# flags, terrain type, alt text, icon, number of zones, of mixed terrains, of roads, of rivers
+RECORD = struct.Struct('<BIIIHHHH')
+# type and number of sides of a mixed terrain
+MIXED = struct.Struct('<IH')
+# Maximum number of zones, mixed terrains, roads, rivers or sides of a tile
+MAX_COUNT = 0xFFFF
+
+# Index of the string of a missing value
+NO_STRING = 0xFFFFFFFF
+
+# Flags of a record
+HAS_CONTENT = 1
+HAS_TERRAIN = 2
+
+
+def is_pack_file(path: Optional[str]) -> bool:
+    """
+    Args:
+        path (Optional[str]): a path
+
+    Returns:
+        bool: True if the path is a map pack
+    """
+    return path is not None and Path(path).suffix.lower() == PACK_SUFFIX
+
+
+def check_counts(tile: TileMetadata, values: Dict[str, List[Any]]):
+    """
+    Args:
+        tile (TileMetadata): a tile
+        values (Dict[str, List[Any]]): values of the tile, by name
+
+    Raises:
+        ValueError: if there are more than MAX_COUNT values of a name
+    """
+    for name, named_values in values.items():
+        if len(named_values) > MAX_COUNT:
+            raise ValueError(f'the tile at column {tile.col}, row {tile.row} has '
+                             f'{len(named_values)} {name}, more than the {MAX_COUNT} of a '
+                             'map pack')
+
+
+def encode_tile(tile: TileMetadata, string_id: Callable[[Any], int]) -> bytes:
+    """Encode what is drawn of a tile. Values are stored as strings: the tile is drawn the
+    same, but other metadata of its file, like notes, is not kept.
+
+    Args:
+        tile (TileMetadata): a tile
+        string_id (Callable[[Any], int]): the index of the string of a value in the table
+
+    Raises:
+        ValueError: if the tile has more than MAX_COUNT values of a kind
+
+    Returns:
+        bytes: the record of the tile
+    """
+    content = tile.content
+    terrain = content.get('terrain', {}) or {}
+    mixed = [mixed for mixed in terrain.get('mixed', []) or [] if isinstance(mixed, dict)]
+    zones = as_list(content['zone']) if 'zone' in content else []
+    roads = as_list(content.get('roads', []))
+    rivers = as_list(content.get('rivers', []))
+
+    def optional_id(mapping: Dict[str, Any], key: str) -> int:
+        return string_id(mapping[key]) if key in mapping else NO_STRING
+
+    sides = [as_list(mixed_terrain.get('sides', [])) for mixed_terrain in mixed]
+    check_counts(tile, {'zones': zones, 'mixed terrains': mixed, 'roads': roads,
+                        'rivers': rivers, 'sides': max(sides, key=len, default=[])})
+
+    flags = (HAS_CONTENT if content else 0) | (HAS_TERRAIN if 'terrain' in content else 0)
+    parts = [RECORD.pack(flags, optional_id(terrain, 'type'), optional_id(content, 'alt'),
+                         optional_id(content, 'icon'), len(zones), len(mixed), len(roads),
+                         len(rivers))]
+    strings = [string_id(value) for value in zones + roads + rivers]
+    parts.append(struct.pack(f'<{len(strings)}I', *strings))
+    for mixed_terrain, mixed_sides in zip(mixed, sides):
+        parts.append(MIXED.pack(optional_id(mixed_terrain, 'type'), len(mixed_sides)))
+        parts.append(struct.pack(f'<{len(mixed_sides)}I', *map(string_id, mixed_sides)))
+    return b''.join(parts)
+
+
+def write_pack(tiles: Iterable[TileMetadata], path: Path) -> int:
+    """Write the tiles of a map in a pack. When several tiles have the same coordinates, the
+    last one is kept, as in a render.
+
+    Args:
+        tiles (Iterable[TileMetadata]): tiles of the map
+        path (Path): the pack to write
+
+    Raises:
+        ValueError: if a tile can't be written in a pack, see encode_tile
+
+    Returns:
+        int: the number of tiles written
+    """
+    # pylint: disable=too-many-locals
+    import numpy as np  # pylint: disable=import-outside-toplevel
+    strings: Dict[str, int] = {}
+
+    def string_id(value: Any) -> int:
+        return strings.setdefault(str(value), len(strings))
+
+    by_coord = {(tile.col, tile.row): tile for tile in tiles}
+    coords = sorted(by_coord)
+    records = [encode_tile(by_coord[coord], string_id) for coord in coords]
+    keys = OccupancyIndex.pack(np.array([col for col, _ in coords], dtype=np.int64),
+                               np.array([row for _, row in coords], dtype=np.int64))
+
+    encoded = [string.encode('utf-8') for string in strings]
+    string_offsets_pos = HEADER.size
+    strings_pos = string_offsets_pos + 8 * (len(encoded) + 1)
+    string_offsets = np.cumsum([strings_pos] + [len(string) for string in encoded])
+    # The index is aligned on 8 bytes, so it can be read in place
+    index_pos = -(-int(string_offsets[-1]) // 8) * 8
+    record_offsets_pos = index_pos + 8 * len(records)
+    records_pos = record_offsets_pos + 8 * len(records)
+    record_offsets = np.cumsum([records_pos] + [len(record) for record in records[:-1]])
+
+    with open(path, 'wb') as pfile:
+        pfile.write(HEADER.pack(MAGIC, VERSION, len(encoded), len(records),
+                                string_offsets_pos, index_pos, record_offsets_pos))
+        pfile.write(string_offsets.astype('<u8').tobytes())
+        pfile.writelines(encoded)
+        pfile.write(b'\0' * (index_pos - int(string_offsets[-1])))
+        pfile.write(keys.astype('<i8').tobytes())
+        pfile.write(record_offsets.astype('<u8')[:len(records)].tobytes())
+        pfile.writelines(records)
+    return len(records)
+
+
+class MapPack:
+    """A map pack opened with mmap. Strings and records are decoded when tiles use them.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, path: Path) -> None:
+        """
+        Args:
+            path (Path): the pack file
+
+        Raises:
+            ValueError: if the file isn't a pack of this version
+        """
+        self.path = path
+        with open(path, 'rb') as pfile:
+            self.__mmap = mmap.mmap(pfile.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.__mmap) < HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not a map pack')
+        (magic, version, self.__string_count, self.__tile_count, self.__string_offsets_pos,
+         self.__index_pos, self.__record_offsets_pos) = HEADER.unpack_from(self.__mmap)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a map pack of version {VERSION}')
+        self.__strings: List[Optional[str]] = [None] * self.__string_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.__tile_count
+
+    def close(self):
+        """Close the file
+        """
+        self.__mmap.close()
+
+    def tiles(self, viewport: Optional[Viewport] = None) -> List[TileMetadata]:
+        """Load the tiles of the map, or only the tiles of a viewport
+
+        Args:
+            viewport (Viewport, optional): the tiles to load
+
+        Returns:
+            List[TileMetadata]: the tiles, by column and row
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        keys = np.frombuffer(self.__mmap, dtype='<i8', count=self.__tile_count,
+                             offset=self.__index_pos)
+        if viewport is None:
+            positions = np.arange(self.__tile_count)
+        else:
+            # Tiles are sorted by column then row: each column of the viewport is a slice
+            cols = np.arange(viewport.col_min, viewport.col_max + 1, dtype=np.int64)
+            starts = np.searchsorted(keys, OccupancyIndex.pack(cols, viewport.row_min))
+            ends = np.searchsorted(keys, OccupancyIndex.pack(cols, viewport.row_max), 'right')
+            positions = np.concatenate([np.arange(start, end, dtype=np.int64)
+                                        for start, end in zip(starts, ends)])
+        cols, rows = OccupancyIndex.unpack(keys[positions])
+        offsets = np.frombuffer(self.__mmap, dtype='<u8', count=self.__tile_count,
+                                offset=self.__record_offsets_pos)[positions]
+        return [self.__decode(col, row, offset) for col, row, offset
+                in zip(cols.tolist(), rows.tolist(), offsets.tolist())]
+
+    def __string(self, string_id: int) -> str:
+        string = self.__strings[string_id]
+        if string is None:
+            start, end = struct.unpack_from('<QQ', self.__mmap,
+                                            self.__string_offsets_pos + 8 * string_id)
+            string = self.__strings[string_id] = sys.intern(
+                self.__mmap[start:end].decode('utf-8'))
+        return string
+
+    def __decode(self, col: int, row: int, offset: int) -> TileMetadata:
+        # pylint: disable=too-many-locals
+        (flags, terrain_type, alt, icon, zone_count, mixed_count, road_count,
+         river_count) = RECORD.unpack_from(self.__mmap, offset)
+        offset += RECORD.size
+        count = zone_count + road_count + river_count
+        strings = [self.__string(string_id) for string_id in
+                   struct.unpack_from(f'<{count}I', self.__mmap, offset)]
+        offset += 4 * count
+
+        terrain: Dict[str, Any] = {}
+        if terrain_type != NO_STRING:
+            terrain['type'] = self.__string(terrain_type)
+        mixed = []
+        for _ in range(mixed_count):
+            mixed_type, side_count = MIXED.unpack_from(self.__mmap, offset)
+            offset += MIXED.size
+            mixed_terrain: Dict[str, Any] = {} if mixed_type == NO_STRING else {
+                'type': self.__string(mixed_type)}
+            mixed_terrain['sides'] = [self.__string(string_id) for string_id in
+                                      struct.unpack_from(f'<{side_count}I', self.__mmap, offset)]
+            offset += 4 * side_count
+            mixed.append(mixed_terrain)
+        if mixed:
+            terrain['mixed'] = mixed
+
+        content: Dict[str, Any] = {}
+        if terrain or flags & HAS_TERRAIN:
+            content['terrain'] = terrain
+        if alt != NO_STRING:
+            content['alt'] = self.__string(alt)
+        if icon != NO_STRING:
+            content['icon'] = self.__string(icon)
+        if zone_count:
+            content['zone'] = strings[:zone_count]
+        if road_count:
+            content['roads'] = strings[zone_count:zone_count + road_count]
+        if river_count:
+            content['rivers'] = strings[zone_count + road_count:]
+        if flags & HAS_CONTENT and not content:
+            # Metadata which isn't drawn still makes the tile drawn with an unknown terrain
+            content['terrain'] = {}
+        return TileMetadata(col, row, content)
@@ -0,0 +1,162 @@
+"""parse_cache.py
+
+Persistent cache of parsed tiles, to avoid parsing files which didn't change since the last run
+"""
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from classes.tilemetadata import TileMetadata
+
+CACHE_FILENAME = '.hexamap-cache.sqlite'
+
+
+class FileKey(NamedTuple):
+    """Identify the content of a file on disk
+    """
+    size: int
+    mtime_ns: int
+    # None until the file is read
+    digest: Optional[str]
+
+
+def file_digest(data: bytes) -> str:
+    """
+    Args:
+        data (bytes): content of a file
+
+    Returns:
+        str: the hash used to know if a content changed
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class ParseCache:
+    """Store the content of tiles parsed from files in a sqlite database.
+
+    A file is considered unchanged if its size and modification time didn't change. If they
+    changed, the file is read and its hash is compared to the stored one, so touching a file
+    doesn't invalidate its entry. The content can also be given later by the caller which
+    reads the file anyway, see lookup_content(). The whole cache is dropped when VERSION changes.
+    """
+
+    # Increase it when the parsing changes, to invalidate existing caches
+    VERSION = 3
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.__db = sqlite3.connect(str(path))
+        self.__init_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __init_schema(self):
+        version = self.__db.execute('PRAGMA user_version').fetchone()[0]
+        if version != self.VERSION:
+            self.__db.execute('DROP TABLE IF EXISTS files')
+            self.__db.execute(f'PRAGMA user_version = {self.VERSION:d}')
+        self.__db.execute('''CREATE TABLE IF NOT EXISTS files (
+                                path TEXT PRIMARY KEY,
+                                size INTEGER NOT NULL,
+                                mtime_ns INTEGER NOT NULL,
+                                digest TEXT NOT NULL,
+                                tiles BLOB NOT NULL)''')
+
+    def close(self):
+        """Write pending changes and close the database
+        """
+        self.__db.commit()
+        self.__db.close()
+        logging.info('parse cache: %d hits, %d misses', self.hits, self.misses)
+
+    def lookup(self, filename: str, read: bool = True
+               ) -> Tuple[Optional[List[TileMetadata]], Optional[FileKey]]:
+        """Look for the tiles of a file in the cache
+
+        Args:
+            filename (str): the file to look for
+            read (bool, optional): read the file when its size or modification time changed.
+                If False, the key has no digest: give the content to lookup_content() once
+                it is read.
+
+        Returns:
+            Tuple[Optional[List[TileMetadata]], Optional[FileKey]]: The tiles if the file didn't
+            change, and the key to give to store() if it has to be parsed again. The key is None
+            if the file can't be read.
+        """
+        path = os.path.abspath(filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, None
+
+        row = self.__db.execute('SELECT size, mtime_ns, digest, tiles FROM files WHERE path = ?',
+                                (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            self.hits += 1
+            return self.__load(row[3]), FileKey(*row[:3])
+
+        key = FileKey(stat.st_size, stat.st_mtime_ns, None)
+        if not read:
+            return None, key
+        try:
+            with open(path, 'rb') as hex_file:
+                data = hex_file.read()
+        except OSError:
+            return None, None
+        return self.lookup_content(filename, key, data)
+
+    def lookup_content(self, filename: str, key: FileKey, data: bytes
+                       ) -> Tuple[Optional[List[TileMetadata]], FileKey]:
+        """Compare the content of a file with the stored one, after lookup() found that its
+        size or modification time changed
+
+        Args:
+            filename (str): the file to look for
+            key (FileKey): the key returned by lookup()
+            data (bytes): the content of the file
+
+        Returns:
+            Tuple[Optional[List[TileMetadata]], FileKey]: The tiles if the content didn't
+            change, and the key, with the digest of the content, to give to store()
+        """
+        path = os.path.abspath(filename)
+        key = key._replace(digest=file_digest(data))
+        row = self.__db.execute('SELECT digest, tiles FROM files WHERE path = ?',
+                                (path,)).fetchone()
+        if row and row[0] == key.digest:
+            # Same content with another modification time
+            self.__db.execute('UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?',
+                              (key.size, key.mtime_ns, path))
+            self.hits += 1
+            return self.__load(row[1]), key
+
+        self.misses += 1
+        return None, key
+
+    def store(self, filename: str, key: FileKey, tiles: List[TileMetadata]):
+        """Store the parsed tiles of a file
+
+        Args:
+            filename (str): the parsed file
+            key (FileKey): the key returned by lookup()
+            tiles (List[TileMetadata]): the tiles parsed from the file
+        """
+        data = pickle.dumps([(tile.col, tile.row, tile.content) for tile in tiles],
+                            protocol=pickle.HIGHEST_PROTOCOL)
+        self.__db.execute('REPLACE INTO files VALUES (?, ?, ?, ?, ?)',
+                          (os.path.abspath(filename), key.size, key.mtime_ns, key.digest, data))
+
+    @staticmethod
+    def __load(data: bytes) -> List[TileMetadata]:
+        return [TileMetadata(col, row, content) for col, row, content in pickle.loads(data)]
@@ -0,0 +1,139 @@
+"""profiler.py
+
+Measure where the time and the memory of a render go: wall time and peak memory of each
+stage of the pipeline, and call counts and time of chosen functions.
+"""
+import functools
+import inspect
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class Profiler:
+    """Collect timings of stages and functions.
+
+    A disabled profiler records nothing, and functions are only wrapped by instrument() when
+    the profiler is enabled, so it costs nothing when profiling is off.
+    """
+
+    def __init__(self, enabled: bool = True, memory: bool = False) -> None:
+        """
+        Args:
+            enabled (bool, optional): record timings
+            memory (bool, optional): also record the peak memory of each stage with
+                tracemalloc, which makes everything slower. Before python 3.9, the peak is
+                the one since the start of the profiling, not the one of the stage.
+        """
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.stages: List[Tuple[str, float, Optional[int]]] = []
+        self.calls: Dict[str, List[float]] = {}
+        self.__originals: List[Tuple[Any, str, Any]] = []
+        if self.memory:
+            tracemalloc.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.restore()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measure a stage of the pipeline
+
+        Args:
+            name (str): name of the stage in the report
+        """
+        if not self.enabled:
+            yield
+            return
+        if self.memory:
+            # Without reset_peak (before python 3.9), nothing is reset
+            getattr(tracemalloc, 'reset_peak', lambda: None)()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if self.memory else None
+            self.stages.append((name, duration, peak))
+
+    def instrument(self, owner: Any, name: str, label: str = None):
+        """Replace a function of a module or a class by a wrapper counting its calls and
+        their time, until restore() is called. Nothing is done if the profiler is disabled.
+
+        Args:
+            owner (Any): the module or the class of the function
+            name (str): name of the function in the owner
+            label (str, optional): name in the report, by default <owner>.<name>
+        """
+        if not self.enabled:
+            return
+        label = label or f"{owner.__name__.rsplit('.', 1)[-1]}.{name}"
+        original = inspect.getattr_static(owner, name)
+        function = original.__func__ if isinstance(original, staticmethod) else original
+        stats = self.calls.setdefault(label, [0, 0.0])
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats[0] += 1
+                stats[1] += time.perf_counter() - start
+
+        self.__originals.append((owner, name, original))
+        setattr(owner, name, staticmethod(wrapper) if isinstance(original, staticmethod)
+                else wrapper)
+
+    def restore(self):
+        """Put back the functions replaced by instrument(), and stop tracing the memory
+        """
+        while self.__originals:
+            owner, name, original = self.__originals.pop()
+            setattr(owner, name, original)
+        if self.memory:
+            tracemalloc.stop()
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: the stages and the calls, ready to be written as json
+        """
+        return {
+            'stages': [{'name': name, 'seconds': round(duration, 6), 'peak_memory': peak}
+                       for name, duration, peak in self.stages],
+            'calls': [{'name': name, 'calls': int(count), 'seconds': round(duration, 6)}
+                      for name, (count, duration) in self.calls.items()],
+        }
+
+    def format_json(self) -> str:
+        """
+        Returns:
+            str: the report as json
+        """
+        return json.dumps(self.report(), indent=2)
+
+    def format_table(self) -> str:
+        """
+        Returns:
+            str: the report as text tables
+        """
+        lines = [f"{'stage':32} {'time (s)':>10} {'peak memory (MB)':>18}"]
+        for name, duration, peak in self.stages:
+            memory = f"{peak / 2 ** 20:18.1f}" if peak is not None else f"{'-':>18}"
+            lines.append(f"{name:32} {duration:10.3f} {memory}")
+        lines.append('')
+        lines.append(f"{'function':32} {'calls':>10} {'time (s)':>10} {'per call (us)':>14}")
+        for name, (count, duration) in sorted(self.calls.items(),
+                                              key=lambda item: -item[1][1]):
+            if count == 0:
+                continue
+            per_call = duration / count * 1e6
+            lines.append(f"{name:32} {count:10d} {duration:10.3f} {per_call:14.1f}")
+        return '\n'.join(lines)
@@ -0,0 +1,390 @@
+"""render_server.py
+
+Render maps on request from a local http server. The server keeps the parsed tiles of each
+directory and the renderers of each map in memory, so a request only parses the files which
+changed and only draws the tiles which changed since the previous render of the same map.
+
+Any web page open in a local browser can send requests to the server, so it only reads the
+directories and css files under a root directory given when it starts.
+"""
+import io
+import itertools
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from classes.grid_renderer import Renderer, add_border_tiles
+from classes.tile_loader import parse_files
+from classes.tilemetadata import TileMetadata
+from classes.viewport import Viewport, viewport_tiles
+from classes.watcher import FileWatcher
+
+# Estimated memory of a tile, in bytes, once parsed and once drawn by a renderer (its shape
+# and its svg fragments), measured on synthetic maps
+PARSED_TILE_BYTES = 200
+RENDERED_TILE_BYTES = 5000
+
+DEFAULT_MEMORY_BUDGET = 512 * 2 ** 20
+DEFAULT_HOST = '127.0.0.1'
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+CSS_SUFFIX = '.css'
+
+
+class MapFiles:
+    """The tiles of the files of a directory and its subdirectories. Only new and modified
+    files are parsed again by refresh().
+    """
+
+    # Versions of the tiles, unique among all directories
+    versions = itertools.count(1)
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.tiles: List[TileMetadata] = []
+        self.version = 0
+        self.__lock = threading.Lock()
+        self.__watcher = FileWatcher([os.path.join(directory, '**', '*')], recursive=True)
+        self.__tiles_by_file: Dict[str, List[TileMetadata]] = {}
+
+    def refresh(self) -> Tuple[int, List[TileMetadata]]:
+        """Parse the files which are new or changed since the last call
+
+        Returns:
+            Tuple[int, List[TileMetadata]]: the version of the tiles, which changes each time
+            a file changes, and the tiles of all files
+        """
+        with self.__lock:
+            changed, removed = self.__watcher.poll()
+            # Files reached through a symbolic link out of the directory are not read
+            changed = [file for file in changed
+                       if TileMetadata.is_valid_basename(os.path.basename(file))
+                       and resolve_path(self.directory, file) is not None]
+            if changed or removed or not self.version:
+                for file in removed:
+                    self.__tiles_by_file.pop(file, None)
+                self.__tiles_by_file.update(zip(changed, parse_files(changed)))
+                self.tiles = [tile for file in self.__watcher.files
+                              for tile in self.__tiles_by_file.get(file, [])]
+                self.version = next(MapFiles.versions)
+                logging.info('%s: %d file(s) parsed, %d removed', self.directory,
+                             len(changed), len(removed))
+            return self.version, self.tiles
+
+    def memory(self) -> int:
+        """
+        Returns:
+            int: estimated memory used by the tiles, in bytes
+        """
+        return len(self.tiles) * PARSED_TILE_BYTES
+
+
+class MapRender:
+    """A renderer of a map, or of a viewport of a map, kept between renders so only the tiles
+    which changed are drawn again
+    """
+
+    def __init__(self, radius: float, viewport: Optional[Viewport] = None,
+                 symbols: bool = False, compact: bool = False) -> None:
+        """
+        Args:
+            radius (float): radius of an hexagon
+            viewport (Viewport, optional): only draw these tiles
+            symbols (bool, optional): see Renderer
+            compact (bool, optional): see Renderer
+        """
+        self.radius = radius
+        self.viewport = viewport
+        self.symbols = symbols
+        self.compact = compact
+        self.renderer: Optional[Renderer] = None
+        self.__version = 0
+        self.__lock = threading.Lock()
+
+    def write_svg(self, map_files: MapFiles, css: str, output: io.TextIOBase) -> None:
+        """Write the svg of the map, after taking into account the changes of its files
+
+        Args:
+            map_files (MapFiles): the files of the map
+            css (str): custom css
+            output (io.TextIOBase): an opened file
+        """
+        with self.__lock:
+            version, hexes = map_files.refresh()
+            if version != self.__version:
+                self.__update(hexes)
+                self.__version = version
+            self.renderer.css = css
+            self.renderer.write_svg(output)
+
+    def __update(self, hexes: List[TileMetadata]):
+        zones = None
+        if self.viewport:
+            tiles, zones = viewport_tiles(hexes, self.viewport, self.radius)
+        else:
+            tiles = add_border_tiles(hexes)
+        if self.renderer is None:
+            self.renderer = Renderer(tiles, '', self.radius, zones, symbols=self.symbols,
+                                     compact=self.compact)
+        else:
+            self.renderer.update_tiles(tiles, zones)
+
+    def memory(self) -> int:
+        """
+        Returns:
+            int: estimated memory used by the renderer, in bytes
+        """
+        return len(self.renderer.tiles) * RENDERED_TILE_BYTES if self.renderer else 0
+
+
+class RenderCache:
+    """Parsed directories and renderers of maps, kept between requests. When their estimated
+    memory goes over the budget, the least recently used ones are dropped.
+    """
+
+    def __init__(self, radius: float, memory_budget: int = DEFAULT_MEMORY_BUDGET) -> None:
+        """
+        Args:
+            radius (float): radius of an hexagon
+            memory_budget (int, optional): memory of the kept maps, in bytes
+        """
+        self.radius = radius
+        self.memory_budget = memory_budget
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__lock = threading.Lock()
+        self.__entries: Dict[Hashable, Union[MapFiles, MapRender]] = OrderedDict()
+
+    def __entry(self, key: Hashable, factory) -> Any:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                entry = self.__entries[key] = factory()
+            else:
+                self.hits += 1
+            self.__entries.move_to_end(key)
+            return entry
+
+    def render(self, directory: str, css: str = '', viewport: Optional[Viewport] = None, *,
+               symbols: bool = False, compact: bool = False) -> str:
+        """Render the map described by the files of a directory. Renders of different maps
+        can run in parallel.
+
+        Args:
+            directory (str): directory of the files describing the map
+            css (str, optional): custom css
+            viewport (Viewport, optional): only draw these tiles
+            symbols (bool, optional): see Renderer
+            compact (bool, optional): see Renderer
+
+        Returns:
+            str: the svg of the map
+        """
+        # pylint: disable=too-many-arguments
+        directory = os.path.realpath(directory)
+        map_files = self.__entry(('files', directory), lambda: MapFiles(directory))
+        map_render = self.__entry(('render', directory, viewport, symbols, compact),
+                                  lambda: MapRender(self.radius, viewport, symbols, compact))
+        output = io.StringIO()
+        map_render.write_svg(map_files, css, output)
+        self.__evict()
+        return output.getvalue()
+
+    def __evict(self):
+        with self.__lock:
+            memory = sum(entry.memory() for entry in self.__entries.values())
+            # The most recently used entry is kept, even if it is bigger than the budget
+            while memory > self.memory_budget and len(self.__entries) > 1:
+                key, entry = self.__entries.popitem(last=False)
+                memory -= entry.memory()
+                self.evictions += 1
+                logging.info('%s dropped from the cache (%d bytes)', key, entry.memory())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: the kept maps and the use of the cache, ready to be written as json
+        """
+        with self.__lock:
+            entries = [{'key': [str(part) for part in key], 'memory': entry.memory()}
+                       for key, entry in self.__entries.items()]
+        return {'memory_budget': self.memory_budget,
+                'memory': sum(entry['memory'] for entry in entries),
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': entries}
+
+
+class RenderServer(ThreadingHTTPServer):
+    """An http server rendering maps with a RenderCache, each request in its own thread
+    """
+
+    def __init__(self, address: Tuple[str, int], cache: RenderCache, root: str) -> None:
+        """
+        Args:
+            address (Tuple[str, int]): host and port of the server
+            cache (RenderCache): the maps kept between requests
+            root (str): requests only read directories and css files under this directory
+        """
+        super().__init__(address, RenderRequestHandler)
+        self.cache = cache
+        self.root = os.path.realpath(root)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """Answer requests of a RenderServer:
+    - GET /render?path=<directory>[&viewport=colmin:colmax,rowmin:rowmax][&css=<css file>]
+      [&symbols=1][&compact=1] returns the svg of the map. The directory and the css file are
+      relative to the root of the server, and must be under it.
+    - POST /render with the same parameters takes the custom css in the body of the request
+    - GET /stats returns the state of the cache as json
+    """
+
+    server: RenderServer
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answer a GET request"""
+        self.__answer(None)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Answer a POST request, whose body is the custom css"""
+        length = int(self.headers.get('Content-Length') or 0)
+        self.__answer(self.rfile.read(length).decode('utf-8'))
+
+    def __answer(self, css: Optional[str]):
+        url = urlsplit(self.path)
+        if url.path == '/stats' and css is None:
+            self.__send(HTTPStatus.OK, 'application/json', json.dumps(self.server.cache.stats()))
+        elif url.path == '/render':
+            self.__render(parse_qs(url.query), css)
+        else:
+            self.__send(HTTPStatus.NOT_FOUND, 'text/plain', f'{url.path} not found')
+
+    def __render(self, params: Dict[str, List[str]], css: Optional[str]):
+        def param(name: str) -> Optional[str]:
+            return params.get(name, [None])[0]
+
+        if not param('path'):
+            self.__send(HTTPStatus.BAD_REQUEST, 'text/plain', 'path is missing')
+            return
+        directory = resolve_path(self.server.root, param('path'))
+        if directory is None:
+            self.__send(HTTPStatus.FORBIDDEN, 'text/plain',
+                        f'{param("path")} is not under the root of the server')
+            return
+        if not os.path.isdir(directory):
+            self.__send(HTTPStatus.NOT_FOUND, 'text/plain', f'{param("path")} is not a directory')
+            return
+        try:
+            viewport = Viewport.parse(param('viewport')) if param('viewport') else None
+        except ValueError as e:
+            self.__send(HTTPStatus.BAD_REQUEST, 'text/plain', str(e))
+            return
+        if css is None and param('css'):
+            css = self.__read_css(param('css'))
+            if css is None:
+                return
+
+        # pylint: disable=broad-except
+        try:
+            svg = self.server.cache.render(
+                directory, css or '', viewport,
+                symbols=(param('symbols') or '').lower() in TRUE_VALUES,
+                compact=(param('compact') or '').lower() in TRUE_VALUES)
+        except Exception as e:
+            logging.warning('render of %s failed: %s', directory, e, exc_info=True)
+            self.__send(HTTPStatus.INTERNAL_SERVER_ERROR, 'text/plain', str(e))
+            return
+        self.__send(HTTPStatus.OK, 'image/svg+xml', svg)
+
+    def __read_css(self, name: str) -> Optional[str]:
+        """Read a css file under the root of the server, or answer with an error
+
+        Returns:
+            Optional[str]: the custom css, or None if an error was sent
+        """
+        css_file = resolve_path(self.server.root, name)
+        if css_file is None or not css_file.lower().endswith(CSS_SUFFIX):
+            self.__send(HTTPStatus.FORBIDDEN, 'text/plain',
+                        f'{name} is not a {CSS_SUFFIX} file under the root of the server')
+            return None
+        if not os.path.isfile(css_file):
+            self.__send(HTTPStatus.NOT_FOUND, 'text/plain', f'{name} is not a file')
+            return None
+        with open(css_file, 'r', encoding="utf-8") as cfile:
+            return cfile.read()
+
+    def __send(self, status: HTTPStatus, content_type: str, body: str):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.info('%s - %s', self.address_string(), format % args)
+
+
+def parse_address(value: str) -> Tuple[str, int]:
+    """Parse a server address argument
+
+    Args:
+        value (str): "[HOST:]PORT"
+
+    Raises:
+        ValueError: if the port isn't a number
+
+    Returns:
+        Tuple[str, int]: host and port. The default host only accepts local connections.
+    """
+    host, _, port = value.rpartition(':')
+    return host or DEFAULT_HOST, int(port)
+
+
+def resolve_path(root: str, path: Optional[str]) -> Optional[str]:
+    """Find a path requested to the server, relative to its root
+
+    Args:
+        root (str): the root of the server, as returned by os.path.realpath
+        path (Optional[str]): a path relative to the root, or an absolute path
+
+    Returns:
+        Optional[str]: the real path, symbolic links resolved, or None if it is missing or
+        not under the root
+    """
+    if not path:
+        return None
+    # An absolute path replaces the root in the join, and is checked like any other
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        return None
+    return resolved
+
+
+def serve(address: Tuple[str, int], radius: float,
+          memory_budget: int = DEFAULT_MEMORY_BUDGET, root: str = '.') -> None:
+    """Render maps on request, until interrupted
+
+    Args:
+        address (Tuple[str, int]): host and port of the server
+        radius (float): radius of an hexagon
+        memory_budget (int, optional): memory of the maps kept between requests, in bytes
+        root (str, optional): requests only read directories and css files under this
+            directory
+    """
+    with RenderServer(address, RenderCache(radius, memory_budget), root) as server:
+        logging.info('Rendering maps of %s on http://%s:%d/render', server.root,
+                     *server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,54 @@
+"""svg_file.py
+
+Open svg files to write, compressed or not depending on their extension, and read the custom
+css inserted in them
+"""
+import gzip
+import io
+from pathlib import Path
+from typing import TextIO
+
+# Extensions of the files written as is, instead of being used as a directory
+SVG_SUFFIXES = ('.svg', '.svgz')
+
+
+def is_svg_file(path) -> bool:
+    """
+    Args:
+        path (str | Path): an output argument (a file, a directory or None)
+
+    Returns:
+        bool: True if the path is a .svg or .svgz file
+    """
+    return bool(path) and Path(path).suffix in SVG_SUFFIXES
+
+
+def open_svg(path) -> TextIO:
+    """Open a svg file to write. A .svgz file is gzip compressed while it is written, so the
+    uncompressed svg is never stored.
+
+    Args:
+        path (str | Path): the file to write
+
+    Returns:
+        TextIO: the opened file
+    """
+    if Path(path).suffix == '.svgz':
+        # mtime=0 so the same map always gives the same file
+        return io.TextIOWrapper(gzip.GzipFile(path, 'wb', compresslevel=6, mtime=0),
+                                encoding="utf-8")
+    return open(path, 'w', encoding="utf-8")
+
+
+def read_css(css_path: str) -> str:
+    """
+    Args:
+        css_path (str): The css argument (a file or None)
+
+    Returns:
+        str: the custom css, or an empty string
+    """
+    if css_path and Path(css_path).is_file():
+        with open(css_path, 'r', encoding="utf-8") as cfile:
+            return cfile.read()
+    return ''
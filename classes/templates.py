@@ -0,0 +1,36 @@
+"""templates.py
+
+Svg templates and icons. They are found next to the package, whatever the current directory,
+and each template is read on its first use.
+"""
+import functools
+from pathlib import Path
+from string import Template
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent.joinpath('svg_templates')
+ICONS_DIR = TEMPLATES_DIR.joinpath('icons')
+
+
+@functools.lru_cache(maxsize=None)
+def read_template(name: str) -> str:
+    """
+    Args:
+        name (str): name of the template, without the .svg extension
+
+    Returns:
+        str: the content of the template file
+    """
+    with open(TEMPLATES_DIR.joinpath(name + '.svg'), 'r', encoding="utf-8") as tfile:
+        return tfile.read()
+
+
+@functools.lru_cache(maxsize=None)
+def template(name: str) -> Template:
+    """
+    Args:
+        name (str): name of the template, without the .svg extension
+
+    Returns:
+        Template: the template, ready to be substituted
+    """
+    return Template(read_template(name))
@@ -0,0 +1,67 @@
+"""terrain_regions.py
+
+Draw the terrain of a map by regions: adjacent tiles with the same terrain are drawn as a
+single polygon, and the mixed terrain zones of a terrain are drawn by a single path, instead
+of one path by tile and by zone. On big homogeneous maps, it makes far less elements to draw.
+"""
+from typing import Dict, Iterable, List, Set, Tuple
+
+from classes.hexagon_renderer import Cardinal, HexagonRenderer, draw_rings
+from classes.hexcoord import Coord
+from classes.tilemetadata import TileMetadata
+from classes.zone_outline import signed_area, zone_outlines
+
+
+def group_by_terrain(tiles: Iterable[TileMetadata]
+                     ) -> Tuple[Dict[str, Set[Coord]], Dict[str, List[Tuple[Coord, Cardinal]]]]:
+    """Find the tiles of each terrain, and the mixed terrain zones of each terrain
+
+    Args:
+        tiles (Iterable[TileMetadata]): tiles of the map
+
+    Returns:
+        Tuple[Dict[str, Set[Coord]], Dict[str, List[Tuple[Coord, Cardinal]]]]: tiles by css
+        class of their base terrain, and (tile, side) of mixed zones by css class of terrain
+    """
+    bases: Dict[str, Set[Coord]] = {}
+    mixed: Dict[str, List[Tuple[Coord, Cardinal]]] = {}
+    # By coordinates, so the paths don't depend on the order of the files
+    for tile in sorted(tiles, key=lambda tile: (tile.col, tile.row)):
+        terrain, mixed_terrains = HexagonRenderer.terrain(tile)
+        bases.setdefault(terrain, set()).add((tile.col, tile.row))
+        for mixed_terrain, sides in mixed_terrains:
+            mixed.setdefault(mixed_terrain, []).extend(((tile.col, tile.row), side)
+                                                       for side in sides)
+    return bases, mixed
+
+
+def draw_terrain_regions(tiles: Dict[Coord, TileMetadata],
+                         hex_renderer: HexagonRenderer) -> List[str]:
+    """Draw the terrain of the tiles by regions. Base terrains are drawn first, then the mixed
+    terrain zones over them, as draw_content does for a single tile.
+
+    Args:
+        tiles (Dict[Coord, TileMetadata]): tiles of the map, by coordinates
+        hex_renderer (HexagonRenderer): the renderer of the tiles
+
+    Returns:
+        List[str]: svg paths of the regions
+    """
+    def hexagon_points(coord: Coord):
+        return hex_renderer.compute_shape(tiles[coord]).hexagon_points
+
+    bases, mixed = group_by_terrain(tiles.values())
+    paths = []
+    for terrain in sorted(bases):
+        # Regions are traced from the edges of the hexagons, like zones
+        paths.extend(draw_rings(polygon, f"terrain {terrain}", hex_renderer.fmt)
+                     for polygon in zone_outlines(bases[terrain], hexagon_points))
+    for terrain in sorted(mixed):
+        # Mixed zones of a terrain seldom touch each other, so they are not merged but drawn
+        # by a single path. They all turn the same way round, so no seam is visible between
+        # two zones which touch.
+        rings = [hex_renderer.get_zone_points(tiles[coord], side)
+                 for coord, side in mixed[terrain]]
+        paths.append(draw_rings([ring if signed_area(ring) > 0 else ring[::-1]
+                                 for ring in rings], f"terrain {terrain}", hex_renderer.fmt))
+    return paths
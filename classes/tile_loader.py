@@ -0,0 +1,213 @@
+"""tile_loader.py
+
+Find hex files from command line patterns and parse them into TileMetadata
+"""
+import glob
+import logging
+import os
+import threading
+from concurrent.futures import Executor, Future
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from classes.parse_cache import ParseCache
+from classes.tilemetadata import TileMetadata
+
+
+def find_files(patterns: Iterable[str], recursive: bool = False) -> List[str]:
+    """Expand glob patterns into a list of files, in the order they are found
+
+    Args:
+        patterns (Iterable[str]): Path or glob patterns
+        recursive (bool, optional): "**" matches any files and directories, as in glob.glob
+
+    Returns:
+        List[str]: Every path matching the patterns
+    """
+    files = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=recursive)
+        if not matches:
+            logging.warning('File does not exist: %s', pattern)
+        files.extend(matches)
+    return files
+
+
+def parse_file(filename: str) -> Tuple[List[TileMetadata], Optional[str]]:
+    """Parse a single file, catching any error so it can be reported by the caller.
+    This function is used as a worker in the process pool, so it must stay at module level.
+
+    Args:
+        filename (str): the file to parse
+
+    Returns:
+        Tuple[List[TileMetadata], Optional[str]]: the tiles of the file, and an error message
+        if the file can't be parsed
+    """
+    # pylint: disable=broad-except
+    try:
+        return TileMetadata.from_file(filename), None
+    except Exception as e:
+        return [], str(e)
+
+
+def read_tile_file(filename: str) -> bytes:
+    """Read a file, after the checks of TileMetadata.from_file
+
+    Args:
+        filename (str): the file to read
+
+    Returns:
+        bytes: the content of the file
+    """
+    # asyncio is slow to import, so the reader is only imported when files are read with it
+    from classes.async_reader import read_bytes  # pylint: disable=import-outside-toplevel
+    TileMetadata.check_file(filename)
+    return read_bytes(filename)
+
+
+def parse_data(filename: str, data: bytes) -> Tuple[List[TileMetadata], Optional[str]]:
+    """Parse the content of a file, catching any error like parse_file.
+    This function is used as a worker in the process pool, so it must stay at module level.
+
+    Args:
+        filename (str): the file the data was read from
+        data (bytes): the content of the file
+
+    Returns:
+        Tuple[List[TileMetadata], Optional[str]]: the tiles of the file, and an error message
+        if the file can't be parsed
+    """
+    # pylint: disable=broad-except
+    try:
+        return TileMetadata.from_bytes(filename, data), None
+    except Exception as e:
+        return [], str(e)
+
+
+def read_and_parse(files: List[str], concurrency: int, executor: Optional[Executor] = None,
+                   read: Callable[[str], bytes] = read_tile_file,
+                   cached: Optional[Callable[[int, bytes], Optional[List[TileMetadata]]]] = None
+                   ) -> List[Tuple[List[TileMetadata], Optional[str]]]:
+    """Read files with several reads in flight, and parse each one as soon as it is read.
+    With an executor, at most `concurrency` contents wait for it, so the reads wait when the
+    parse is slower: at most twice `concurrency` contents are held at once.
+
+    Args:
+        files (List[str]): files to parse
+        concurrency (int): maximum number of files read at once
+        executor (Executor, optional): parse the files in this pool instead of the current
+            thread
+        read (Callable[[str], bytes], optional): reads a file
+        cached (Callable[[int, bytes], Optional[List[TileMetadata]]], optional): called with
+            the index and the content of each file read, returns its tiles if they are
+            already known, so the file isn't parsed
+
+    Returns:
+        List[Tuple[List[TileMetadata], Optional[str]]]: for each file, as parse_file
+    """
+    from classes.async_reader import read_files  # pylint: disable=import-outside-toplevel
+    results = [None] * len(files)
+    # Released when the executor is done with a content
+    queued = threading.BoundedSemaphore(max(1, concurrency))
+
+    def consume(index: int, data: Optional[bytes], error: Optional[Exception]):
+        tiles = cached(index, data) if cached is not None and error is None else None
+        if error is not None:
+            results[index] = ([], str(error))
+        elif tiles is not None:
+            results[index] = (tiles, None)
+        elif executor is None:
+            results[index] = parse_data(files[index], data)
+        else:
+            queued.acquire()  # pylint: disable=consider-using-with
+            results[index] = executor.submit(parse_data, files[index], data)
+            results[index].add_done_callback(lambda _: queued.release())
+
+    read_files(files, consume, concurrency, read)
+    return [result.result() if isinstance(result, Future) else result for result in results]
+
+
+def load_tiles(files: List[str], jobs: int = 1, cache: Optional[ParseCache] = None,
+               io_concurrency: int = 1) -> List[TileMetadata]:
+    """Parse all files and merge their tiles.
+
+    Tiles are returned in the order of the files, whatever the number of jobs, so the
+    rendering stays the same as a serial run.
+
+    Args:
+        files (List[str]): Files to parse
+        jobs (int, optional): Number of worker processes. 1 parses in the current process.
+        cache (ParseCache, optional): Cache of already parsed files. Only files missing from
+            the cache are parsed, and their tiles are stored in it.
+        io_concurrency (int, optional): Maximum number of files read at once.
+
+    Returns:
+        List[TileMetadata]: The tiles of all files
+    """
+    return [tile for tiles in parse_files(files, jobs, cache, io_concurrency)
+            for tile in tiles]
+
+
+def parse_files(files: List[str], jobs: int = 1, cache: Optional[ParseCache] = None,
+                io_concurrency: int = 1, read: Callable[[str], bytes] = read_tile_file
+                ) -> List[List[TileMetadata]]:
+    """Parse all files. Errors are logged, and files in error have no tiles.
+
+    Args:
+        files (List[str]): Files to parse
+        jobs (int, optional): Number of worker processes. 1 parses in the current process.
+        cache (ParseCache, optional): Cache of already parsed files.
+        io_concurrency (int, optional): Maximum number of files read at once. Above 1, files
+            are read by threads and parsed as soon as they are read, which is much faster
+            when reads are slow, like on network mounts. The cache then compares the content
+            of changed files once they are read, instead of reading them beforehand.
+        read (Callable[[str], bytes], optional): reads a file when io_concurrency is above 1
+
+    Returns:
+        List[List[TileMetadata]]: The tiles of each file, in the same order as files
+    """
+    # pylint: disable=too-many-locals
+    results: List[Tuple[List[TileMetadata], Optional[str]]] = [None] * len(files)
+    keys = {}
+    for i, file in enumerate(files):
+        if cache and TileMetadata.is_valid_basename(os.path.basename(file)):
+            tiles, keys[i] = cache.lookup(file, read=io_concurrency <= 1)
+            if tiles is not None:
+                results[i] = (tiles, None)
+
+    to_parse = [i for i, result in enumerate(results) if result is None]
+    to_parse_files = [files[i] for i in to_parse]
+
+    def lookup_content(index: int, data: bytes) -> Optional[List[TileMetadata]]:
+        i = to_parse[index]
+        if not keys.get(i):
+            return None
+        tiles, key = cache.lookup_content(files[i], keys[i], data)
+        # Found tiles are already stored
+        keys[i] = key if tiles is None else None
+        return tiles
+
+    cached = lookup_content if cache else None
+    if jobs > 1 and len(to_parse) > 1:
+        # pylint: disable=import-outside-toplevel
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            if io_concurrency > 1:
+                parsed = read_and_parse(to_parse_files, io_concurrency, executor, read, cached)
+            else:
+                parsed = list(executor.map(parse_file, to_parse_files,
+                                           chunksize=max(1, len(to_parse) // (jobs * 4))))
+    elif io_concurrency > 1:
+        parsed = read_and_parse(to_parse_files, io_concurrency, read=read, cached=cached)
+    else:
+        parsed = [parse_file(file) for file in to_parse_files]
+
+    for i, result in zip(to_parse, parsed):
+        results[i] = result
+        if cache and keys.get(i) and not result[1]:
+            cache.store(files[i], keys[i], result[0])
+
+    for _, error in results:
+        if error:
+            logging.warning(error)
+    return [tiles for tiles, _ in results]
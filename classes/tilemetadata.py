@@ -3,16 +3,53 @@
 Define Metadata and useful types to work with tiles
 """
 import errno
+import io
 import logging
 import os
 import re
+import sys
 from enum import Enum, EnumMeta, auto
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
-import frontmatter
 import yaml
 
+try:
+    # libyaml is much faster than the pure python implementation, but it may not be available
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+MD_PATTERN = re.compile(r'^(-?\d{2})(-?\d{2})(?:-|_).*\.md$')
+YAML_PATTERN = re.compile(r'^.*\.(?:yaml|yml)$')
+FRONTMATTER_BOUNDARY = re.compile(r'^-{3,}\s*$', re.MULTILINE)
+
+
+def load_frontmatter(text: str) -> Dict[str, Any]:
+    """Extract the yaml frontmatter of a markdown text.
+
+    It behaves like python-frontmatter, without its overhead: no frontmatter or a frontmatter
+    which isn't a mapping give an empty dict.
+
+    Args:
+        text (str): the content of a markdown file
+
+    Raises:
+        ValueError: the frontmatter has no closing boundary
+
+    Returns:
+        Dict[str, Any]: the metadata of the frontmatter
+    """
+    text = text.strip()
+    if not FRONTMATTER_BOUNDARY.match(text):
+        return {}
+    try:
+        _, matter, _ = FRONTMATTER_BOUNDARY.split(text, 2)
+    except ValueError as e:
+        raise ValueError('the frontmatter has no closing boundary') from e
+    metadata = yaml.load(matter, Loader=YamlLoader)
+    return metadata if isinstance(metadata, dict) else {}
+
 
 class CardinalEnumMeta(EnumMeta):
     """ Metaclass to replace Ouest by West and handle yaml no as North West instead of false
@@ -75,37 +112,60 @@ class Cardinal(Enum, metaclass=CardinalEnumMeta):
             Cardinal.W]
 
 
+# Content of the tiles without metadata, like border tiles. It is shared, so it must never
+# be modified.
+EMPTY_CONTENT: Dict[str, Any] = {}
+
+
+def as_list(value: Any) -> List[Any]:
+    """Lists of the metadata, like zones, roads or sides, may be written as a single value
+
+    Returns:
+        List[Any]: the value if it is a list, or else a list of the value
+    """
+    return value if isinstance(value, list) else [value]
+
+
+def intern_value(value: Any) -> Any:
+    """
+    Returns:
+        Any: the interned string if value is a string, value otherwise
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class TileMetadata:
     """Metadata for a tile
     """
 
+    # Big maps have a lot of tiles: without __dict__, a tile is much smaller
+    __slots__ = ('col', 'row', 'content', 'icon', 'zones')
+
     def __init__(self, col: int, row: int, content: Dict[str, Any] = None) -> None:
         self.col = col
         self.row = row
-        self.content = {}
-        if content:
-            self.content = content
+        self.content = content if content else EMPTY_CONTENT
         self.icon = None
-        self.zones = self.content.get('zone', []) if isinstance(
-            self.content.get('zone', []), List) else [
-            self.content.get('zone', [])]
+        # Zones and icons are shared by many tiles, so their names are interned
+        self.zones: Tuple[Any, ...] = tuple(map(intern_value,
+                                                as_list(self.content.get('zone', []))))
 
         # Icon from Building
         icon_path = self.content.get(
             'icon', None)
         if icon_path:
-            self.icon = 'building/' + icon_path
+            self.icon = sys.intern('building/' + icon_path)
 
         # icon from Terrain
         if not icon_path:
             center_tile = [terrain for terrain in self.content.get("terrain", {}).get(
-                "mixed", []) if 'C' in terrain.get("sides", [])]
+                "mixed", []) if 'C' in as_list(terrain.get("sides", []))]
             if not center_tile:
                 icon_path = self.content.get("terrain", {}).get("type", None)
             else:
                 icon_path = center_tile[0].get("type", None)
             if icon_path:
-                self.icon = 'terrain/' + icon_path
+                self.icon = sys.intern('terrain/' + icon_path)
 
     @staticmethod
     def from_file(filename: Path):
@@ -117,38 +177,109 @@ class TileMetadata:
         Returns:
             List[TileMetadata]: One or several TileMetadata described in the file
         """
+        TileMetadata.check_file(filename)
+        with open(filename, 'r', encoding="utf-8") as hex_file:
+            return TileMetadata.from_text(filename, hex_file.read())
+
+    @staticmethod
+    def check_file(filename: Path) -> None:
+        """Check that a file exists and can describe tiles, before reading it
+
+        Args:
+            filename (filepath): the relative or absolute path of the file to parse
+
+        Raises:
+            FileNotFoundError: if the file doesn't exist
+            ValueError: if the name of the file isn't valid
+        """
         # The file must exists
         if not os.path.isfile(filename):
             raise FileNotFoundError(
                 errno.ENOENT, os.strerror(errno.ENOENT), filename)
 
+        basename = os.path.basename(filename)
+        if not TileMetadata.is_valid_basename(basename):
+            raise ValueError(f'{basename} is not a valid basename.')
+
+    @staticmethod
+    def from_bytes(filename: Path, data: bytes):
+        """Parse the raw content of an Hexfile, decoded like from_file does
+
+        Args:
+            filename (filepath): the name of the file the data comes from
+            data (bytes): the content of the file
+
+        Returns:
+            List[TileMetadata]: One or several TileMetadata described in the data
+        """
+        # Same decoding and newlines as a file opened in text mode
+        with io.TextIOWrapper(io.BytesIO(data), encoding="utf-8") as text:
+            return TileMetadata.from_text(filename, text.read())
+
+    @staticmethod
+    def is_valid_basename(basename: str) -> bool:
+        """
+        Args:
+            basename (str): the name of a file, without its directory
+
+        Returns:
+            bool: true if the file can describe some tiles
+        """
+        return MD_PATTERN.match(basename) is not None or YAML_PATTERN.match(basename) is not None
+
+    @staticmethod
+    def coordinates(basename: str) -> Optional[Tuple[int, int]]:
+        """
+        Args:
+            basename (str): the name of a file, without its directory
+
+        Returns:
+            Optional[Tuple[int, int]]: (col, row) of the tile described by a markdown file,
+            None for other files
+        """
+        match_md = MD_PATTERN.match(basename)
+        if match_md is None:
+            return None
+        return int(match_md.group(2)), int(match_md.group(1))
+
+    @staticmethod
+    def from_text(filename: Path, text: str):
+        """Parse the content of an Hexfile. The filename gives the format of the content
+        and, for markdown files, the coordinates of the tile.
+
+        Args:
+            filename (filepath): the name of the file the text comes from
+            text (str): the content of the file
+
+        Returns:
+            List[TileMetadata]: One or several TileMetadata described in the text
+        """
         # The filename should follow the pattern XXYY-<some_name>.md
         basename = os.path.basename(filename)
-        match_md = re.match(r'^(-?\d{2})(-?\d{2})(?:-|_).*\.md$', basename)
-        match_yaml = re.match(r'^.*\.(?:yaml|yml)$', basename)
+        match_md = MD_PATTERN.match(basename)
+        match_yaml = YAML_PATTERN.match(basename)
 
         if match_md is not None:
             col = int(match_md.group(2))
             row = int(match_md.group(1))
-            content: Dict[str:Any] = {}
-
-            with open(filename, 'r', encoding="utf-8") as hex_file:
-                content = frontmatter.load(hex_file).metadata
+            try:
+                content: Dict[str:Any] = load_frontmatter(text)
+            except ValueError as e:
+                raise ValueError(f'{basename}: {e}') from e
 
             return [TileMetadata(col, row, content)]
         if match_yaml is not None:
             result = []
-            with open(filename, 'r', encoding="utf-8") as hex_file:
-                for doc in yaml.load_all(hex_file, Loader=yaml.Loader):
-                    for (key, value) in doc.items():
-                        match_xy = re.match(r'^(-?\d{2})(-?\d{2})$', key)
-                        if match_xy is None:
-                            logging.warning(
-                                '%s in file %s is not a valid coordinate', key, filename)
-                            continue
-                        col = int(match_xy.group(2))
-                        row = int(match_xy.group(1))
-                        result.append(TileMetadata(col, row, value))
+            for doc in yaml.load_all(text, Loader=YamlLoader):
+                for (key, value) in doc.items():
+                    match_xy = re.match(r'^(-?\d{2})(-?\d{2})$', key)
+                    if match_xy is None:
+                        logging.warning(
+                            '%s in file %s is not a valid coordinate', key, filename)
+                        continue
+                    col = int(match_xy.group(2))
+                    row = int(match_xy.group(1))
+                    result.append(TileMetadata(col, row, value))
             return result
 
         # No matching case
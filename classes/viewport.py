@@ -0,0 +1,157 @@
+"""viewport.py
+
+Render only a rectangle of columns and rows of a map: only the files and the tiles around
+it are read, and zones crossing its border are clipped instead of being closed.
+"""
+import os
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from classes.grid_renderer import compute_zones
+from classes.tilemetadata import TileMetadata
+from classes.zone_outline import Ring
+
+# Size of the squares of the TileIndex, in tiles
+BUCKET_SIZE = 16
+
+
+class Viewport(NamedTuple):
+    """A rectangle of tiles, bounds included
+    """
+    col_min: int
+    col_max: int
+    row_min: int
+    row_max: int
+
+    @staticmethod
+    def parse(value: str) -> 'Viewport':
+        """Parse a viewport argument
+
+        Args:
+            value (str): "colmin:colmax,rowmin:rowmax"
+
+        Raises:
+            ValueError: if the value isn't a valid viewport
+
+        Returns:
+            Viewport: the viewport
+        """
+        cols, _, rows = value.partition(',')
+        col_min, _, col_max = cols.partition(':')
+        row_min, _, row_max = rows.partition(':')
+        viewport = Viewport(int(col_min), int(col_max), int(row_min), int(row_max))
+        if viewport.col_min > viewport.col_max or viewport.row_min > viewport.row_max:
+            raise ValueError(f'{value} is not a valid viewport')
+        return viewport
+
+    def contains(self, col: int, row: int) -> bool:
+        """
+        Returns:
+            bool: True if the tile is in the viewport
+        """
+        return self.col_min <= col <= self.col_max and self.row_min <= row <= self.row_max
+
+    def expand(self, margin: int) -> 'Viewport':
+        """
+        Returns:
+            Viewport: the viewport with `margin` more tiles on each side
+        """
+        return Viewport(self.col_min - margin, self.col_max + margin,
+                        self.row_min - margin, self.row_max + margin)
+
+    def coords(self) -> Iterator[Tuple[int, int]]:
+        """
+        Returns:
+            Iterator[Tuple[int, int]]: (col, row) of every tile of the viewport
+        """
+        return ((col, row) for col in range(self.col_min, self.col_max + 1)
+                for row in range(self.row_min, self.row_max + 1))
+
+
+class TileIndex:
+    """Find the tiles in a rectangle without looking at every tile: tiles are stored by
+    squares of BUCKET_SIZE columns and rows.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, tiles: Iterable[TileMetadata], bucket_size: int = BUCKET_SIZE) -> None:
+        self.bucket_size = bucket_size
+        self.__buckets: Dict[Tuple[int, int], List[TileMetadata]] = {}
+        for tile in tiles:
+            self.__buckets.setdefault(self.__bucket(tile.col, tile.row), []).append(tile)
+
+    def __bucket(self, col: int, row: int) -> Tuple[int, int]:
+        return col // self.bucket_size, row // self.bucket_size
+
+    def query(self, viewport: Viewport) -> List[TileMetadata]:
+        """
+        Args:
+            viewport (Viewport): a rectangle of tiles
+
+        Returns:
+            List[TileMetadata]: the tiles in the rectangle
+        """
+        col_min, row_min = self.__bucket(viewport.col_min, viewport.row_min)
+        col_max, row_max = self.__bucket(viewport.col_max, viewport.row_max)
+        return [tile
+                for bucket_col in range(col_min, col_max + 1)
+                for bucket_row in range(row_min, row_max + 1)
+                for tile in self.__buckets.get((bucket_col, bucket_row), [])
+                if viewport.contains(tile.col, tile.row)]
+
+
+def filter_files(files: Iterable[str], viewport: Viewport) -> List[str]:
+    """Remove markdown files which describe a tile out of the viewport, or not next to it.
+    Other files may describe any tile, so they are kept.
+
+    Args:
+        files (Iterable[str]): files to parse
+        viewport (Viewport): the rendered viewport
+
+    Returns:
+        List[str]: the files which may describe tiles to render
+    """
+    margin = viewport.expand(1)
+    result = []
+    for file in files:
+        coords = TileMetadata.coordinates(os.path.basename(file))
+        if coords is None or margin.contains(*coords):
+            result.append(file)
+    return result
+
+
+def viewport_tiles(tiles: Iterable[TileMetadata], viewport: Viewport, radius: float
+                   ) -> Tuple[List[TileMetadata], Dict[str, List[List[Ring]]]]:
+    """Select the tiles to draw in a viewport
+
+    Args:
+        tiles (Iterable[TileMetadata]): tiles of the map
+        viewport (Viewport): the rendered viewport
+        radius (float): radius of an hexagon
+
+    Returns:
+        Tuple[List[TileMetadata], Dict[str, List[List[Ring]]]]: Every tile of the viewport,
+        empty ones included, and the outlines of the zones of the viewport and the tiles
+        next to it, so a zone crossing the border of the viewport is clipped by the view box
+        instead of being closed.
+    """
+    index = TileIndex(tiles)
+    inside = {(tile.col, tile.row): tile for tile in index.query(viewport)}
+    drawn = [inside.get(coord) or TileMetadata(*coord) for coord in viewport.coords()]
+    return drawn, viewport_zones(index, viewport, radius)
+
+
+def viewport_zones(index: TileIndex, viewport: Viewport, radius: float
+                   ) -> Dict[str, List[List[Ring]]]:
+    """Compute the outlines of the zones of a viewport and the tiles next to it. A zone
+    crossing the border of the viewport is closed one tile out of it, so the view box clips it.
+
+    Args:
+        index (TileIndex): tiles of the map
+        viewport (Viewport): the rendered viewport
+        radius (float): radius of an hexagon
+
+    Returns:
+        Dict[str, List[List[Ring]]]: Outlines of the zones, as returned by compute_zones
+    """
+    return compute_zones(index.query(viewport.expand(1)), radius)
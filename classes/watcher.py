@@ -0,0 +1,50 @@
+"""watcher.py
+
+Poll files matching glob patterns to find which ones changed
+"""
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from classes.tile_loader import find_files
+
+
+class FileWatcher:
+    """Detect new, modified and removed files by comparing their size and modification time
+    between two calls of poll(). It only relies on os.stat, so it works everywhere.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, patterns: Iterable[str], recursive: bool = False) -> None:
+        """
+        Args:
+            patterns (Iterable[str]): Path or glob patterns of the watched files
+            recursive (bool, optional): "**" matches any files and directories
+        """
+        self.patterns = list(patterns)
+        self.recursive = recursive
+        self.files: List[str] = []
+        self.__stats: Dict[str, Tuple[int, int]] = {}
+
+    def poll(self) -> Tuple[List[str], List[str]]:
+        """Look for changes since the last call. The first call returns all files.
+
+        Returns:
+            Tuple[List[str], List[str]]: files which are new or modified, and removed files
+        """
+        files = find_files(self.patterns, self.recursive)
+        stats = {}
+        for file in files:
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            stats[file] = (stat.st_size, stat.st_mtime_ns)
+
+        changed = [file for file, stat in stats.items()
+                   if self.__stats.get(file) != stat]
+        removed = [file for file in self.__stats if file not in stats]
+
+        self.files = [file for file in files if file in stats]
+        self.__stats = stats
+        return changed, removed
@@ -0,0 +1,128 @@
+"""zone_outline.py
+
+Compute the outline of groups of tiles from the adjacency of hexagons.
+
+Since hexagons tile the plane, the border of a group of tiles is made of the edges whose
+neighbor isn't in the group. Those edges are chained into rings without any polygon union.
+"""
+from typing import Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+from classes.hexcoord import Coord, neighbor
+
+Ring = List[Tuple[float, float]]
+
+
+def connected_components(members: Set[Coord]) -> List[List[Coord]]:
+    """Split a group of tiles in groups of adjacent tiles
+
+    Args:
+        members (Set[Coord]): the tiles of the group
+
+    Returns:
+        List[List[Coord]]: groups of tiles connected by an edge
+    """
+    components = []
+    visited = set()
+    for start in sorted(members):
+        if start in visited:
+            continue
+        visited.add(start)
+        component = []
+        stack = [start]
+        while stack:
+            coord = stack.pop()
+            component.append(coord)
+            for edge in range(6):
+                other = neighbor(coord, edge)
+                if other in members and other not in visited:
+                    visited.add(other)
+                    stack.append(other)
+        components.append(component)
+    return components
+
+
+def signed_area(ring: Ring) -> float:
+    """
+    Args:
+        ring (Ring): points of a closed ring, without repeating the first one
+
+    Returns:
+        float: the signed area of the ring (shoelace formula)
+    """
+    return sum(x_0 * y_1 - x_1 * y_0 for (x_0, y_0), (x_1, y_1)
+               in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+def trace_rings(component: Iterable[Coord], members: Set[Coord],
+                hexagon_points: Callable[[Coord], Sequence[Tuple[float, float]]]) -> List[Ring]:
+    """Chain the border edges of a group of connected tiles into rings
+
+    Args:
+        component (Iterable[Coord]): connected tiles
+        members (Set[Coord]): all tiles of the group, the component included
+        hexagon_points (Callable[[Coord], Sequence[Tuple[float, float]]]): outer points of
+            a tile, in the order E, NE, NW, W, SW, SE
+
+    Returns:
+        List[Ring]: the rings of the border of the component
+    """
+    border = [(coord, edge) for coord in sorted(component) for edge in range(6)
+              if neighbor(coord, edge) not in members]
+    visited: Set[Tuple[Coord, int]] = set()
+    rings = []
+    for start in border:
+        if start in visited:
+            continue
+        ring = []
+        coord, edge = start
+        while (coord, edge) not in visited:
+            visited.add((coord, edge))
+            ring.append(tuple(hexagon_points(coord)[edge]))
+            # At the end of the edge, the border either follows the next edge of the tile,
+            # or continues on the tile behind the next edge if it belongs to the group.
+            next_tile = neighbor(coord, (edge + 1) % 6)
+            if next_tile in members:
+                coord, edge = next_tile, (edge + 5) % 6
+            else:
+                edge = (edge + 1) % 6
+        rings.append(ring)
+    return rings
+
+
+def zone_outlines(members: Set[Coord],
+                  hexagon_points: Callable[[Coord], Sequence[Tuple[float, float]]]
+                  ) -> List[List[Ring]]:
+    """Compute the outline of a group of tiles.
+
+    Args:
+        members (Set[Coord]): the tiles of the group
+        hexagon_points (Callable[[Coord], Sequence[Tuple[float, float]]]): outer points of
+            a tile, in the order E, NE, NW, W, SW, SE
+
+    Returns:
+        List[List[Ring]]: One polygon for each group of connected tiles. The first ring of a
+        polygon is its exterior, the other ones are its holes.
+    """
+    polygons = []
+    for component in connected_components(members):
+        rings = trace_rings(component, members, hexagon_points)
+        # The exterior ring surrounds the holes, so it is the largest one
+        rings.sort(key=lambda ring: -abs(signed_area(ring)))
+        polygons.append(rings)
+    return polygons
+
+
+def group_by_zone(zones_of_tiles: Iterable[Tuple[Coord, Iterable[str]]]) -> Dict[str, Set[Coord]]:
+    """Find the tiles of each zone, in a single pass over the tiles
+
+    Args:
+        zones_of_tiles (Iterable[Tuple[Coord, Iterable[str]]]): zones of each tile
+
+    Returns:
+        Dict[str, Set[Coord]]: tiles of each zone
+    """
+    members: Dict[str, Set[Coord]] = {}
+    for coord, zones in zones_of_tiles:
+        for zone in zones:
+            members.setdefault(zone, set()).add(coord)
+    return members
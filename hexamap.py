@@ -6,23 +6,88 @@ Generate a nice svg map from a bunch of markdown file with medadata.
 # !/usr/bin/env python3
 
 import argparse
-import glob
+import cProfile
 import logging
 import sys
+import time
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List
+from typing import ContextManager, Dict, List, Optional, Tuple
 
-from classes.grid_renderer import Renderer
+from classes import grid_renderer
+from classes.chunked_export import export_chunks, parse_tile_size
+from classes.fragment_cache import FRAGMENT_CACHE_FILENAME, FragmentCache
+from classes.grid_renderer import Renderer, add_border_tiles
+from classes.hexagon_renderer import HexagonRenderer
+from classes.lod_export import export_levels, parse_levels
+from classes.map_pack import PACK_SUFFIX, MapPack, is_pack_file, write_pack
+from classes.parse_cache import CACHE_FILENAME, ParseCache
+from classes.profiler import Profiler
+from classes.svg_file import is_svg_file, open_svg, read_css
+from classes.tile_loader import find_files, parse_files
 from classes.tilemetadata import TileMetadata
+from classes.viewport import Viewport, filter_files, viewport_tiles
+from classes.watcher import FileWatcher
 
+RADIUS = 100.0
 
-def generate_from_metadatas(hexes: List[TileMetadata], output_path: Path, css: str):
+# Functions whose calls are counted and timed by --profile, as (module or class, name)
+PROFILED_FUNCTIONS = [
+    (TileMetadata, 'from_text'),
+    (HexagonRenderer, 'compute_shapes'),
+    (HexagonRenderer, 'load_icon'),
+    (HexagonRenderer, 'draw_content'),
+    (HexagonRenderer, 'draw_grid'),
+    (HexagonRenderer, 'draw_numbers'),
+    (grid_renderer, 'zone_outlines'),
+    (grid_renderer, 'draw_rings'),
+    (Renderer, '__init__'),
+    (Renderer, 'update_tiles'),
+    (Renderer, 'write_svg'),
+]
+
+
+def generate_from_metadatas(hexes: List[TileMetadata], output_path: Path, css: str,
+                            **options):
     """Generate the grid from files
 
     Args:
         hexes (dict[col, row]Hexagon): set of hexagons identified by a tuple (col, row)
         output_path (_type_): The file to write
         css (_type_): A custom css to insert in the final file
+        options: other arguments of the Renderer (symbols, compact, jobs, fragment_cache)
+    """
+    with open_svg(output_filename(hexes, output_path)) as ofile:
+        # Generating canevas with empty hexes around boundaries
+        Renderer(add_border_tiles(hexes), css, RADIUS, **options).write_svg(ofile)
+
+
+def generate_viewport(hexes: List[TileMetadata], viewport: Viewport, output_path: Path,
+                      css: str, **options):
+    """Generate the grid of a part of the map
+
+    Args:
+        hexes (List[TileMetadata]): tiles of the map, or at least of the viewport and around it
+        viewport (Viewport): the tiles to draw
+        output_path (Path): The file to write
+        css (str): A custom css to insert in the final file
+        options: other arguments of the Renderer (symbols, compact, jobs, fragment_cache)
+    """
+    tiles, zones = viewport_tiles(hexes, viewport, RADIUS)
+    with open_svg(output_filename(tiles, output_path)) as ofile:
+        Renderer(tiles, css, RADIUS, zones, **options).write_svg(ofile)
+
+
+def output_filename(hexes: List[TileMetadata], output_path: Path) -> Path:
+    """Compute the file to write. If output_path is not a .svg or .svgz file, the name of the file
+    is generated from the boundaries of the map.
+
+    Args:
+        hexes (List[TileMetadata]): tiles of the map
+        output_path (Path): The output argument (a .svg or .svgz file, a directory or None)
+
+    Returns:
+        Path: the file to write
     """
     # find map boundary
     col_min, col_max = None, None
@@ -41,89 +106,349 @@ def generate_from_metadatas(hexes: List[TileMetadata], output_path: Path, css: s
                   str(col_min) + 'cM' + str(col_max) + 'rm' + \
                   str(row_min) + 'rM' + str(row_max) + '.svg'
 
-    if output_path and Path(output_path).suffix == '.svg':
+    if is_svg_file(output_path):
         output_file = output_path
 
     elif output_path:
         output_file = Path(output_path).joinpath(output_file)
 
-    with open(output_file, 'w', encoding="utf-8") as ofile:
-        # Generating canevas with empty hexes around boundaries
-        canvas = Renderer(add_border_tiles(hexes), css, 100.0).draw_svg()
-        ofile.write(canvas)
+    return output_file
 
 
-def add_border_tiles(tiles: List[TileMetadata]) -> List[TileMetadata]:
-    """Add empty tiles around the existing one, to have a nicer render
+def chunks_location(output_path: str) -> Tuple[Path, str, str]:
+    """Compute where to write chunks
 
     Args:
-        tiles (List[TileMetadata]): Liste of tiles from files
+        output_path (str): The output argument (a .svg or .svgz file, a directory or None)
 
     Returns:
-        List[TileMetadata]: The input tiles, plus tiles that are with them.
+        Tuple[Path, str, str]: The directory of the chunks, the prefix of their names and their
+        extension
     """
+    if is_svg_file(output_path):
+        return Path(output_path).parent, Path(output_path).stem, Path(output_path).suffix
+    return Path(output_path or '.'), 'hexgrid', '.svg'
 
-    if len(tiles) == 0:
-        logging.error("No tiles found")
-        return [TileMetadata(0, 0)]
 
-    tmptiles = [[
-        TileMetadata(tile.col-1, tile.row-1),
-        TileMetadata(tile.col-1, tile.row),
-        TileMetadata(tile.col+1, tile.row-1),
-        TileMetadata(tile.col+1, tile.row),
-    ] for tile in tiles if tile.col % 2 == 0
-    ] + [[
-        TileMetadata(tile.col-1, tile.row+1),
-        TileMetadata(tile.col-1, tile.row),
-        TileMetadata(tile.col+1, tile.row+1),
-        TileMetadata(tile.col+1, tile.row),
-    ] for tile in tiles if tile.col % 2 == 1] + [[
-        TileMetadata(tile.col, tile.row-1),
-        TileMetadata(tile.col, tile.row+1),
-    ] for tile in tiles if tile.col] + [tiles]
+def renderer_options(options: argparse.Namespace) -> Dict[str, bool]:
+    """
+    Args:
+        options (argparse.Namespace): command line arguments
+
+    Returns:
+        Dict[str, bool]: arguments of the Renderer given on the command line
+    """
+    return {'symbols': options.symbols, 'compact': options.compact,
+            'terrain_regions': options.terrain_regions}
+
+
+def parse(files: List[str], options: argparse.Namespace) -> List[List[TileMetadata]]:
+    """Parse files, using the parse cache unless disabled. Map packs are read directly,
+    only around the viewport if there is one.
+
+    Args:
+        files (List[str]): files to parse
+        options (argparse.Namespace): command line arguments
 
-    # Contains all tiles from params, and tiles that have a border with them,
-    # with no content (they will be drawed with some default contents)
+    Returns:
+        List[List[TileMetadata]]: the tiles of each file
+    """
+    packs = {i for i, file in enumerate(files) if is_pack_file(file)}
+    hex_files = [file for i, file in enumerate(files) if i not in packs]
+    if options.no_cache:
+        parsed = parse_files(hex_files, options.jobs, io_concurrency=options.io_concurrency)
+    else:
+        with ParseCache(cache_path(options.output)) as parse_cache:
+            parsed = parse_files(hex_files, options.jobs, parse_cache, options.io_concurrency)
+    # Tiles next to the viewport are needed to draw its zones
+    margin = options.viewport.expand(1) if options.viewport else None
+    remaining = iter(parsed)
+    return [read_pack(file, margin) if i in packs else next(remaining)
+            for i, file in enumerate(files)]
+
+
+def read_pack(filename: str, viewport: Optional[Viewport] = None) -> List[TileMetadata]:
+    """
+    Args:
+        filename (str): a map pack
+        viewport (Viewport, optional): only read the tiles of this rectangle
 
-    filtered_tiles = {(tile.col, tile.row): tile for l in tmptiles for tile in l}
+    Returns:
+        List[TileMetadata]: the tiles of the pack, none if it can't be read
+    """
+    try:
+        with MapPack(filename) as pack:
+            return pack.tiles(viewport)
+    except (OSError, ValueError) as e:
+        logging.warning(e)
+        return []
 
-    return filtered_tiles.values()
+
+def pack_command(argv: List[str]):
+    """Compile files into a map pack, which renders read instead of the files
+
+    Args:
+        argv (List[str]): arguments of the command, after "pack"
+    """
+    pack_parser = argparse.ArgumentParser(
+        prog="hexamap.py pack",
+        description="Compile hex files into a single binary file, read by renders much " +
+                    "faster than the files (see the README)")
+    pack_parser.add_argument("src_path", metavar="path", type=str, nargs='+',
+                             help="Path to files to be packed; accepts * as wildcard")
+    pack_parser.add_argument("--output", type=str, required=True,
+                             help=f"The pack to write, with a {PACK_SUFFIX} extension")
+    pack_parser.add_argument("--jobs", type=int, default=1,
+                             help="Number of processes used to parse the files (default: 1)")
+    pack_parser.add_argument("--io-concurrency", type=int, default=1, metavar="N",
+                             help="Number of files read at once (default: 1)")
+    pack_parser.add_argument("--no-cache", action="store_true",
+                             help="Parse every file, without using the parse cache")
+    pack_options = pack_parser.parse_args(argv)
+    if not is_pack_file(pack_options.output):
+        pack_parser.error(f"the output must have a {PACK_SUFFIX} extension")
+    pack_options.viewport = None
+
+    files = find_files(pack_options.src_path)
+    tiles = [tile for tiles in parse(files, pack_options) for tile in tiles]
+    try:
+        count = write_pack(tiles, pack_options.output)
+    except ValueError as e:
+        logging.error(e)
+        sys.exit(1)
+    print(f"{count} tiles of {len(files)} files written in {pack_options.output}")
+
+
+def open_fragment_cache(options: argparse.Namespace) -> ContextManager[Optional[FragmentCache]]:
+    """
+    Args:
+        options (argparse.Namespace): command line arguments
+
+    Returns:
+        ContextManager[Optional[FragmentCache]]: the fragment cache stored next to the output,
+        or None if caches are disabled
+    """
+    if options.no_cache:
+        return nullcontext()
+    return FragmentCache(cache_path(options.output, FRAGMENT_CACHE_FILENAME),
+                         int(options.fragment_cache_size * 2 ** 20))
+
+
+def watch(options: argparse.Namespace):
+    """Render the map each time a file changes, until interrupted.
+    Only modified files are parsed again, and only their tiles are drawn again.
+
+    Args:
+        options (argparse.Namespace): command line arguments
+    """
+    watcher = FileWatcher(options.src_path + ([options.css] if options.css else []))
+    tiles_by_file: Dict[str, List[TileMetadata]] = {}
+    renderer = None
+    try:
+        while True:
+            changed, removed = watcher.poll()
+            if changed or removed:
+                for file in removed:
+                    tiles_by_file.pop(file, None)
+                hex_files = [file for file in changed if file != options.css]
+                tiles_by_file.update(zip(hex_files, parse(hex_files, options)))
+
+                hexes = [tile for file in watcher.files for tile in tiles_by_file.get(file, [])]
+                tiles = list(add_border_tiles(hexes))
+                if renderer is None:
+                    renderer = Renderer(tiles, read_css(options.css), RADIUS, jobs=options.jobs,
+                                        **renderer_options(options))
+                else:
+                    renderer.update_tiles(tiles)
+                    renderer.css = read_css(options.css)
+
+                output_file = output_filename(hexes, options.output)
+                with open_fragment_cache(options) as fragment_cache, \
+                        open_svg(output_file) as ofile:
+                    renderer.fragment_cache = fragment_cache
+                    renderer.write_svg(ofile)
+                    renderer.fragment_cache = None
+                logging.info('%d file(s) changed, %s written', len(changed) + len(removed),
+                             output_file)
+            time.sleep(options.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def cache_path(output_path: str, filename: str = CACHE_FILENAME) -> Path:
+    """Compute where to store a cache: in the directory of the output
+
+    Args:
+        output_path (str): The output argument (a .svg, .svgz or pack file, a directory or None)
+        filename (str, optional): The name of the cache file, the parse cache by default
+
+    Returns:
+        Path: the path of the cache file
+    """
+    directory = Path('.')
+    if is_svg_file(output_path) or is_pack_file(output_path):
+        directory = Path(output_path).parent
+    elif output_path:
+        directory = Path(output_path)
+    return directory.joinpath(filename)
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ['pack']:
+        pack_command(sys.argv[2:])
+        sys.exit(0)
+
     parser = argparse.ArgumentParser()
     parser.add_argument("src_path", metavar="path", type=str, nargs='*',
                         help="Path to files to be merged; enclose in quotes, accepts * as " +
                              "wildcard for directories or filenames")
     parser.add_argument("--output", type=str, default=None,
                         help="File or directory. If the output end with a .svg extension," +
-                             " it will write the file. Elsewhere, it will put a svg file with " +
+                             " it will write the file (gzip compressed for a .svgz " +
+                             "extension). Elsewhere, it will put a svg file with " +
                              "a generated name at the location")
     parser.add_argument("--css", type=str, default=None,
                         help="Css file to override default css values")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of processes used to parse the files and draw the map " +
+                             "(default: 1)")
+    parser.add_argument("--io-concurrency", type=int, default=1, metavar="N",
+                        help="Number of files read at once. Files are parsed as soon as they " +
+                             "are read, which is much faster on network mounts (default: 1)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse every file and draw every tile, without reading nor " +
+                             "writing the parse and fragment caches stored next to the output")
+    parser.add_argument("--fragment-cache-size", type=float, default=100, metavar="MB",
+                        help="Maximum size of the cache of drawn tiles, in MB. Tiles unused " +
+                             "for the most runs are removed above it (default: 100)")
 
-    args = parser.parse_args()
-
-    metadatas = []
+    parser.add_argument("--symbols", action="store_true",
+                        help="Declare the hexagon shapes and icons once and draw each tile " +
+                             "with <use> references to them, which makes a smaller file " +
+                             "(about 45%% smaller)")
+    parser.add_argument("--compact", action="store_true",
+                        help="Write numbers with at most two decimals and no trailing zeros")
+    parser.add_argument("--terrain-regions", action="store_true",
+                        help="Draw adjacent tiles with the same terrain as a single polygon, " +
+                             "which makes far less elements on big homogeneous maps")
+    parser.add_argument("--tile-size", type=parse_tile_size, default=None,
+                        metavar="COLS[xROWS]",
+                        help="Split the map in chunks of COLS columns and ROWS rows, each one " +
+                             "in its own svg file, plus a json manifest of the chunks")
+    parser.add_argument("--lod", type=parse_levels, default=None, metavar="LEVELS",
+                        help="Render the map at LEVELS levels of detail, from the full map to " +
+                             "coarser and lighter ones, plus a json manifest of the levels")
+    parser.add_argument("--viewport", type=Viewport.parse, default=None,
+                        metavar="COLMIN:COLMAX,ROWMIN:ROWMAX",
+                        help="Only draw the tiles of these columns and rows (included). " +
+                             "Markdown files of other tiles are not parsed")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running, and render the map again each time a file changes")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="Delay between two checks of the files in watch mode, in seconds " +
+                             "(default: 1)")
+    parser.add_argument("--serve", type=str, default=None, metavar="[HOST:]PORT",
+                        help="Keep running, and render maps requested over http (see the " +
+                             "README). The host defaults to 127.0.0.1")
+    parser.add_argument("--serve-root", type=str, default='.', metavar="DIR",
+                        help="With --serve, the directory whose subdirectories and css files " +
+                             "requests may read. Paths of requests are relative to it " +
+                             "(default: the current directory)")
+    parser.add_argument("--cache-memory", type=float, default=512, metavar="MB",
+                        help="With --serve, memory of the maps kept between requests, in MB. " +
+                             "Least recently used maps are dropped above it (default: 512)")
 
-    for arg in args.src_path:
-        files = glob.glob(arg)
+    parser.add_argument("--verbose", action="store_true",
+                        help="Log the progress of the run, like the hits and misses of the caches")
+    parser.add_argument("--profile", choices=['table', 'json'], nargs='?', const='table',
+                        default=None,
+                        help="Print the time of each stage, and the calls and time of the main " +
+                             "functions, on the error output (default format: table)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="With --profile, also measure the peak memory of each stage. " +
+                             "It makes the render slower")
+    parser.add_argument("--profile-dump", type=str, default=None, metavar="FILE",
+                        help="Write cProfile statistics of the run in FILE, to be read with " +
+                             "pstats or snakeviz")
 
-        if not files:
-            logging.warning('File does not exist: %s', arg, file=sys.stderr)
-        for file in files:
-            # pylint: disable=broad-except
-            try:
-                for tile in TileMetadata.from_file(file):
-                    metadatas.append(tile)
-            except Exception as e:
-                logging.warning(e)
-
-    CSS = ''
+    args = parser.parse_args()
+    if args.watch and args.tile_size:
+        parser.error("--tile-size can't be used with --watch")
+    if args.viewport and (args.watch or args.tile_size):
+        parser.error("--viewport can't be used with --watch or --tile-size")
+    if args.lod and (args.watch or args.tile_size or args.viewport):
+        parser.error("--lod can't be used with --watch, --tile-size or --viewport")
+    if args.serve and any((args.src_path, args.watch, args.tile_size, args.viewport,
+                           args.lod)):
+        parser.error("--serve can't be used with paths, --watch, --tile-size, --viewport " +
+                     "or --lod")
+    if args.serve:
+        # The server is only imported when used, as http.server is slow to import
+        from classes import render_server  # pylint: disable=import-outside-toplevel
+        try:
+            serve_address = render_server.parse_address(args.serve)
+        except ValueError:
+            parser.error(f"{args.serve} is not a valid [HOST:]PORT")
+        if not Path(args.serve_root).is_dir():
+            parser.error(f"{args.serve_root} is not a directory")
 
-    if args.css and Path(args.css).is_file():
-        with open(args.css, 'r', encoding="utf-8") as cfile:
-            CSS = cfile.read()
+    if args.watch or args.serve or args.verbose:
+        logging.basicConfig(level=logging.INFO)
 
-    generate_from_metadatas(metadatas, args.output, CSS)
+    cprofile = cProfile.Profile() if args.profile_dump else None
+    with Profiler(enabled=args.profile is not None, memory=args.profile_memory) as profiler:
+        for function in PROFILED_FUNCTIONS:
+            profiler.instrument(*function)
+        profiler.instrument(sys.modules[__name__], 'add_border_tiles', 'add_border_tiles')
+        if cprofile:
+            cprofile.enable()
+        try:
+            if args.serve:
+                with profiler.stage('serve'):
+                    render_server.serve(serve_address, RADIUS, int(args.cache_memory * 2 ** 20),
+                                        args.serve_root)
+            elif args.watch:
+                with profiler.stage('watch'):
+                    watch(args)
+            else:
+                with profiler.stage('glob'):
+                    src_files = find_files(args.src_path)
+                    if args.viewport:
+                        src_files = filter_files(src_files, args.viewport)
+                with profiler.stage('parse'):
+                    metadatas = [tile for tiles in parse(src_files, args) for tile in tiles]
+                with profiler.stage('render'):
+                    if args.tile_size:
+                        chunks_dir, chunks_prefix, chunks_suffix = chunks_location(args.output)
+                        export_chunks(add_border_tiles(metadatas), chunks_dir, chunks_prefix,
+                                      read_css(args.css), RADIUS, size=args.tile_size,
+                                      jobs=args.jobs, suffix=chunks_suffix,
+                                      **renderer_options(args))
+                    else:
+                        with open_fragment_cache(args) as fragments:
+                            if args.lod:
+                                levels_dir, levels_prefix, levels_suffix = chunks_location(
+                                    args.output)
+                                export_levels(metadatas, levels_dir, levels_prefix,
+                                              read_css(args.css), RADIUS, levels=args.lod,
+                                              suffix=levels_suffix, jobs=args.jobs,
+                                              fragment_cache=fragments,
+                                              **renderer_options(args))
+                            elif args.viewport:
+                                generate_viewport(metadatas, args.viewport, args.output,
+                                                  read_css(args.css), jobs=args.jobs,
+                                                  fragment_cache=fragments,
+                                                  **renderer_options(args))
+                            else:
+                                generate_from_metadatas(metadatas, args.output,
+                                                        read_css(args.css), jobs=args.jobs,
+                                                        fragment_cache=fragments,
+                                                        **renderer_options(args))
+        finally:
+            if cprofile:
+                cprofile.disable()
+                cprofile.dump_stats(args.profile_dump)
+            if args.profile == 'json':
+                print(profiler.format_json(), file=sys.stderr)
+            elif args.profile:
+                print(profiler.format_table(), file=sys.stderr)